@@ -2,7 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from utils.data_loader import load_real_data, get_mine_context
+from utils.data_loader import DATASETS, find_sites, get_mine_context
+from utils.query_engine import get_engine
+from utils.refresh import start_background_refresh
+from utils.calculations import calculate_stope_statistics, calculate_equipment_efficiency
+from utils.profiling import PROFILE_BY_DEFAULT, span, start_profile, stop_profile
+from components.profiler import create_profiler_panel, remember_profile
 from components.stope_analysis import create_stope_analysis
 from components.blast_sequencing import create_blast_sequencing
 from components.equipment_utilization import create_equipment_utilization
@@ -33,50 +38,108 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def main():
+# Each analysis view with the dataset it displays and the function that renders it
+VIEWS = {
+    "Stope Width Analysis": ('stope', create_stope_analysis),
+    "Blast Sequencing": ('blast', create_blast_sequencing),
+    "Equipment Utilization": ('equipment', create_equipment_utilization),
+}
+
+def select_date_range(extent):
+    """Draw the date range filter for a dataset's (first, last) dates and return the chosen (start, end)"""
+    st.sidebar.subheader("Date Range Filter")
+    if extent is None:
+        st.sidebar.caption("This dataset has no dates to filter on.")
+        return None, None
+    
+    min_date = extent[0].date()
+    max_date = extent[1].date()
+    # Views have different date extents; carry the last selection across them
+    start_date, end_date = st.session_state.get('selected_date_range', (min_date, max_date))
+    start_date, end_date = max(start_date, min_date), min(end_date, max_date)
+    if start_date > end_date:
+        start_date, end_date = min_date, max_date
+    
+    date_range = st.sidebar.date_input(
+        "Select date range",
+        [start_date, end_date],
+        min_value=min_date,
+        max_value=max_date
+    )
+    # The widget returns a single date while the user is still picking the range
+    if len(date_range) != 2:
+        return None, None
+    st.session_state['selected_date_range'] = tuple(date_range)
+    return date_range
+
+def render_dashboard():
     # Header
     st.markdown('<h1 class="main-header">⛏️ Mining Data Dashboard</h1>', unsafe_allow_html=True)
     
-    # Load data
-    stope_data, blast_data, equipment_data = load_real_data()
-    
     # Sidebar
     st.sidebar.title("Navigation")
     analysis_type = st.sidebar.selectbox(
         "Select Analysis Type",
-        ["Stope Width Analysis", "Blast Sequencing", "Equipment Utilization"]
+        list(VIEWS)
     )
+    dataset, create_view = VIEWS[analysis_type]
+    engine = get_engine()
+    # New data is loaded and swapped in by a background thread, off the request path
+    refresher = start_background_refresh(engine)
+    
+    # Open only the dataset on screen; the others load in the background
+    with span('open_dataset', view=analysis_type, backend=engine.backend):
+        extent = engine.date_extent(dataset)
+    engine.prefetch([name for name in DATASETS if name != dataset])
     
     # Date range filter
-    st.sidebar.subheader("Date Range Filter")
-    if not stope_data.empty:
-        min_date = stope_data['date'].min()
-        max_date = stope_data['date'].max()
-        start_date, end_date = st.sidebar.date_input(
-            "Select date range",
-            [min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
+    start_date, end_date = select_date_range(extent)
+    
+    # Data directories with one subdirectory per mine get a site filter
+    sites = find_sites()
+    selected_sites = st.sidebar.multiselect("Sites", sites, default=sites) if sites else None
+    
+    # Aggregates are built once per data version over the whole dataset, then
+    # sliced: rollup cubes, or for the equipment view the KPI engine's summed hours
+    if dataset == 'equipment':
+        with span('equipment_kpis'):
+            aggregates = engine.equipment_kpis(start_date, end_date, selected_sites)
+    else:
+        with span('rollups'):
+            aggregates = engine.rollups(dataset, start_date, end_date, selected_sites)
+    
+    with span('fetch_rows') as attrs:
+        data = engine.fetch(dataset, start_date, end_date, selected_sites)
+        attrs['rows'] = len(data)
+    
+    # Figures are reused while the data version and every filter are unchanged
+    version = data.attrs.get('version')
+    cache_key = None if version is None else (
+        engine.backend, version, start_date, end_date,
+        None if selected_sites is None else tuple(selected_sites),
+    )
     
     # Main content based on selection
-    if analysis_type == "Stope Width Analysis":
-        create_stope_analysis(stope_data)
-    elif analysis_type == "Blast Sequencing":
-        create_blast_sequencing(blast_data)
-    elif analysis_type == "Equipment Utilization":
-        create_equipment_utilization(equipment_data)
+    with span(create_view.__name__, rows=len(data)):
+        create_view(data, aggregates, cache_key)
     
-    # Key Metrics Overview
+    # Key Metrics Overview; datasets still loading in the background are skipped
     st.sidebar.markdown("---")
     st.sidebar.subheader("Key Metrics")
     
-    if not stope_data.empty:
-        avg_width = stope_data['stope_width'].mean()
+    stope_rollups = aggregates if dataset == 'stope' else engine.peek_rollups('stope', start_date, end_date, selected_sites)
+    if stope_rollups is None:
+        st.sidebar.caption("Average Stope Width: loading…")
+    elif not stope_rollups[('day', ())].empty:
+        avg_width = calculate_stope_statistics(stope_rollups[('day', ())])['mean_width']
         st.sidebar.metric("Average Stope Width", f"{avg_width:.2f}m")
     
-    if not equipment_data.empty:
-        avg_utilization = equipment_data['utilization_rate'].mean()
+    # Utilization is operated over calendar hours, as on the equipment view
+    equipment_kpis = aggregates if dataset == 'equipment' else engine.peek_equipment_kpis(start_date, end_date, selected_sites)
+    if equipment_kpis is None:
+        st.sidebar.caption("Avg Equipment Utilization: loading…")
+    elif not equipment_kpis.empty:
+        avg_utilization = calculate_equipment_efficiency(equipment_kpis)['avg_utilization']
         st.sidebar.metric("Avg Equipment Utilization", f"{avg_utilization:.1f}%")
 
     # Mine Context Information
@@ -88,5 +151,30 @@ def main():
     st.sidebar.write(f"**Depth:** {mine_info['depth_category']}")
     st.sidebar.write(f"**Examples:** {', '.join(mine_info['typical_operations'])}")
 
+    # New data is swapped in by the background refresh, or on the next rerun when it
+    # is off; allow a manual reload
+    st.sidebar.markdown("---")
+    if refresher is not None:
+        st.sidebar.caption(f"Checking for new data every {refresher.interval:g}s")
+    if st.sidebar.button("Reload Data"):
+        get_engine().invalidate()
+        st.rerun()
+
+def main():
+    # Opt-in per-rerun instrumentation; the toggle's state is read before it is drawn
+    profile = None
+    if st.session_state.get('profile_renders', PROFILE_BY_DEFAULT):
+        profile = start_profile()
+    try:
+        with span('app.main'):
+            render_dashboard()
+    finally:
+        stop_profile()
+    
+    st.sidebar.checkbox("Profile Renders", value=PROFILE_BY_DEFAULT, key='profile_renders',
+                        help="Time each stage of the page and export the timings as a trace")
+    if profile is not None:
+        create_profiler_panel(profile, remember_profile(profile))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,231 @@
+"""Headless benchmarks of the dashboard's load, filter, aggregate and figure stages
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --sizes 10k 1M 10M --output results.json
+    python -m benchmarks.run_benchmarks --sizes 10k --baseline results.json
+
+Each size is the approximate row count of every synthetic dataset. Results
+are written as JSON; with --baseline, stages slower than the baseline by
+more than --tolerance are reported and the exit status is 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from utils.data_loader import (
+    SIDECAR_DIR, filter_by_date, invalidate_data_cache, load_real_data, write_sample_data,
+)
+from utils.rollups import build_rollups
+from utils.equipment_kpis import build_equipment_kpis
+from utils.calculations import (
+    calculate_blast_efficiency, calculate_equipment_efficiency, calculate_stope_statistics,
+)
+from components.stope_analysis import build_stope_figures
+from components.blast_sequencing import build_blast_figures
+from components.equipment_utilization import build_equipment_figures
+
+DEFAULT_SIZES = ['10k', '1M', '10M']
+SPAN_START = '2022-01-01'
+SPAN_END = '2023-12-31'
+EQUIPMENT_TYPE_COUNT = 4
+
+def parse_size(text):
+    """Parse a row count such as 10000, 10k or 1M"""
+    multipliers = {'k': 1000, 'm': 1000000}
+    text = text.strip().lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+def format_size(rows):
+    for suffix, factor in (('M', 1000000), ('k', 1000)):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+class Recorder:
+    """Collect wall time and peak traced memory of named stages"""
+
+    def __init__(self, size, trace_memory=True, verbose=False):
+        self.size = size
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.results = []
+
+    @contextlib.contextmanager
+    def stage(self, name, **extra):
+        record = {'size': self.size, 'stage': name}
+        record.update(extra)
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with output:
+                yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if self.trace_memory:
+                record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                tracemalloc.stop()
+            self.results.append(record)
+            print(f"  {name:<28} {record['seconds']:>9.3f}s"
+                  + (f" {record['peak_mb']:>9.1f}MB" if 'peak_mb' in record else '')
+                  + (f" {record['figure_bytes'] / 1024:>10.0f}KB json" if 'figure_bytes' in record else ''))
+
+def generate_datasets(data_dir, rows):
+    """Write synthetic stope, blast and equipment CSVs of about `rows` rows each"""
+    days = len(pd.date_range(SPAN_START, SPAN_END, freq='D'))
+    per_day = max(math.ceil(rows / days), 1)
+    return write_sample_data(
+        data_dir,
+        n_stopes=per_day,
+        n_blasts=per_day,
+        units_per_type=max(math.ceil(per_day / EQUIPMENT_TYPE_COUNT), 1),
+        start=SPAN_START,
+        end=SPAN_END,
+    )
+
+def run_size(rows, trace_memory=True, verbose=False):
+    """Benchmark every stage at one dataset size and return the records"""
+    recorder = Recorder(format_size(rows), trace_memory, verbose)
+    data_dir = tempfile.mkdtemp(prefix=f"mining-bench-{format_size(rows)}-")
+    try:
+        print(f"Generating ~{rows:,} rows per dataset in {data_dir}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            written = generate_datasets(data_dir, rows)
+        print(f"  rows written: {written}")
+
+        invalidate_data_cache()
+        shutil.rmtree(os.path.join(data_dir, SIDECAR_DIR), ignore_errors=True)
+        with recorder.stage('load_csv_cold'):
+            load_real_data(data_dir)
+
+        invalidate_data_cache()
+        with recorder.stage('load_columnar_sidecar'):
+            load_real_data(data_dir)
+
+        with recorder.stage('load_cached'):
+            stope_data, blast_data, equipment_data = load_real_data(data_dir)
+
+        end = stope_data['date'].max()
+        ranges = {
+            'week': (end - pd.Timedelta(days=6), end),
+            'month': (end - pd.Timedelta(days=29), end),
+        }
+        for label, (start_date, end_date) in ranges.items():
+            with recorder.stage(f'filter_{label}') as record:
+                filtered = [filter_by_date(df, start_date, end_date)
+                            for df in (stope_data, blast_data, equipment_data)]
+                record['rows'] = sum(len(df) for df in filtered)
+
+        rollups = {}
+        for name, df in (('stope', stope_data), ('blast', blast_data)):
+            with recorder.stage(f'rollups_{name}'):
+                rollups[name] = build_rollups(name, df)
+        with recorder.stage('kpis_equipment'):
+            equipment_kpis = build_equipment_kpis(equipment_data)
+
+        with recorder.stage('calculations_raw'):
+            calculate_stope_statistics(stope_data)
+            calculate_blast_efficiency(blast_data)
+            calculate_equipment_efficiency(equipment_data)
+
+        with recorder.stage('calculations_rollup'):
+            calculate_stope_statistics(rollups['stope'][('day', ())])
+            calculate_blast_efficiency(rollups['blast'][('day', ())])
+            calculate_equipment_efficiency(equipment_kpis)
+
+        builders = (
+            ('stope', build_stope_figures, stope_data, rollups['stope']),
+            ('blast', build_blast_figures, blast_data, rollups['blast']),
+            ('equipment', build_equipment_figures, equipment_data, equipment_kpis),
+        )
+        for name, builder, df, aggregates in builders:
+            with recorder.stage(f'figures_{name}'):
+                figures = builder(df, aggregates)
+            with recorder.stage(f'serialize_{name}') as record:
+                record['figure_bytes'] = sum(len(fig.to_json()) for fig in figures.values())
+    finally:
+        invalidate_data_cache()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return recorder.results
+
+def compare(results, baseline, tolerance):
+    """Print per-stage ratios against a baseline and return the regressions"""
+    previous = {(r['size'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'size':<6} {'stage':<28} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for record in results:
+        before = previous.get((record['size'], record['stage']))
+        if before is None or not before['seconds']:
+            continue
+        ratio = record['seconds'] / before['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append((record, before))
+        print(f"{record['size']:<6} {record['stage']:<28} {before['seconds']:>9.3f}s "
+              f"{record['seconds']:>9.3f}s {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help='rows per dataset, e.g. 10k 1M 10M')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='where to write the JSON results')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown per stage before flagging a regression')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip tracemalloc peak memory tracking (lower overhead)')
+    parser.add_argument('--verbose', action='store_true', help='show data loader output')
+    args = parser.parse_args(argv)
+    # pandas/plotly deprecation notices would drown out the timing table
+    warnings.simplefilter('ignore', FutureWarning)
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(parse_size(size), not args.no_memory, args.verbose))
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plotly': plotly.__version__,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2, default=float)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
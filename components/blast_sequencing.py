@@ -3,14 +3,79 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.calculations import calculate_blast_efficiency
+from utils.downsampling import downsample_frame
+from utils.profiling import span
+from components.profiler import plotly_chart
+from utils.figure_cache import cached_figures
+from utils.rollups import build_rollups
 
-def create_blast_sequencing(blast_data):
-    """Create blast sequencing analysis dashboard"""
+def build_blast_figures(blast_data, rollups):
+    """Build the blast sequencing figures, keyed by chart, without rendering them"""
+    figures = {}
+    
+    # Explosives usage over time; blast ids repeat across mines, so each
+    # site's blasts are separate series
+    site = 'site' if 'site' in blast_data.columns else None
+    explosives_series = downsample_frame(blast_data, 'date', 'explosives_used',
+                                         group=['site', 'blast_id'] if site else 'blast_id')
+    figures['explosives_over_time'] = px.line(explosives_series, x='date', y='explosives_used', color='blast_id',
+                                              line_dash=site,
+                                              title='Explosives Usage Over Time',
+                                              labels={'explosives_used': 'Explosives (kg)', 'date': 'Date'})
+    
+    # Fragmentation vs Explosives
+    # Marker sizes must be non-negative, so clip any negative vibration readings
+    figures['fragmentation_vs_explosives'] = px.scatter(blast_data, x='explosives_used', y='fragmentation_size',
+                                                        color='blast_id', symbol=site,
+                                                        size=blast_data['vibration_level'].clip(lower=0),
+                                                        title='Fragmentation vs Explosives Used',
+                                                        labels={'explosives_used': 'Explosives (kg)', 
+                                                               'fragmentation_size': 'Fragmentation Size (m)'})
+    
+    sequence_cube = rollups[('day', ('sequence_number',))]
+    sequence_analysis = sequence_cube.mean('fragmentation_size', by='sequence_number')
+    for measure in ['explosives_used', 'vibration_level']:
+        sequence_analysis[measure] = sequence_cube.mean(measure, by='sequence_number')[measure]
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=sequence_analysis['sequence_number'], 
+                            y=sequence_analysis['fragmentation_size'],
+                            name='Fragmentation Size',
+                            yaxis='y1'))
+    fig.add_trace(go.Scatter(x=sequence_analysis['sequence_number'], 
+                            y=sequence_analysis['explosives_used'],
+                            name='Explosives Used',
+                            yaxis='y2'))
+    
+    fig.update_layout(
+        title='Blast Sequence Performance',
+        xaxis_title='Sequence Number',
+        yaxis=dict(title='Fragmentation Size (m)', side='left'),
+        yaxis2=dict(title='Explosives (kg)', side='right', overlaying='y')
+    )
+    figures['sequence_performance'] = fig
+    return figures
+
+def create_blast_sequencing(blast_data, rollups=None, cache_key=None):
+    """Create blast sequencing analysis dashboard
+
+    `rollups` are the blast rollup cubes for the same rows as `blast_data`;
+    they are built on the fly when not supplied. With a `cache_key`
+    identifying the active filters and data version, the figures are
+    served from the figure cache on repeat visits.
+    """
     
     st.header("💥 Blast Sequencing Analysis")
     
+    if blast_data.empty:
+        st.info("No blast data in the selected date range.")
+        return
+    
+    if rollups is None:
+        rollups = build_rollups('blast', blast_data)
+    
     # Key metrics
-    efficiency = calculate_blast_efficiency(blast_data)
+    efficiency = calculate_blast_efficiency(rollups[('day', ())])
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -23,49 +88,19 @@ def create_blast_sequencing(blast_data):
     with col4:
         st.metric("Blast Frequency", f"{efficiency['blast_frequency']:.1f}/day")
     
+    with span('build_blast_figures', rows=len(blast_data)):
+        figures = cached_figures('blast', cache_key, lambda: build_blast_figures(blast_data, rollups))
+    
     # Charts
     col1, col2 = st.columns(2)
     
     with col1:
-        # Explosives usage over time
-        fig = px.line(blast_data, x='date', y='explosives_used', color='blast_id',
-                     title='Explosives Usage Over Time',
-                     labels={'explosives_used': 'Explosives (kg)', 'date': 'Date'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['explosives_over_time'], 'explosives_over_time', use_container_width=True)
     
     with col2:
-        # Fragmentation vs Explosives
-        fig = px.scatter(blast_data, x='explosives_used', y='fragmentation_size',
-                        color='blast_id', size='vibration_level',
-                        title='Fragmentation vs Explosives Used',
-                        labels={'explosives_used': 'Explosives (kg)', 
-                               'fragmentation_size': 'Fragmentation Size (m)'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['fragmentation_vs_explosives'], 'fragmentation_vs_explosives', use_container_width=True)
     
     # Sequence analysis
     st.subheader("Blast Sequence Analysis")
     
-    sequence_analysis = blast_data.groupby('sequence_number').agg({
-        'fragmentation_size': 'mean',
-        'explosives_used': 'mean',
-        'vibration_level': 'mean'
-    }).reset_index()
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=sequence_analysis['sequence_number'], 
-                            y=sequence_analysis['fragmentation_size'],
-                            name='Fragmentation Size',
-                            yaxis='y1'))
-    fig.add_trace(go.Scatter(x=sequence_analysis['sequence_number'], 
-                            y=sequence_analysis['explosives_used'],
-                            name='Explosives Used',
-                            yaxis='y2'))
-    
-    fig.update_layout(
-        title='Blast Sequence Performance',
-        xaxis_title='Sequence Number',
-        yaxis=dict(title='Fragmentation Size (m)', side='left'),
-        yaxis2=dict(title='Explosives (kg)', side='right', overlaying='y')
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(figures['sequence_performance'], 'sequence_performance', use_container_width=True)
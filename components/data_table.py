@@ -0,0 +1,99 @@
+import math
+import streamlit as st
+import pandas as pd
+from utils.profiling import span
+from utils.tables import (
+    EXPORT_FORMATS, PAGE_SIZES, apply_table_filters, cached_export, cached_sort_order, export_table,
+    store_export, table_page,
+)
+
+EXPORT_MIME_TYPES = {
+    'CSV': 'text/csv',
+    'Parquet': 'application/octet-stream',
+}
+
+def _column_filters(data, key):
+    """Draw a filter for every id/label and measure column and return the active ones"""
+    filters = {}
+    with st.expander("Column Filters"):
+        columns = st.columns(3)
+        filterable = [column for column in data.columns if column != 'date']
+        for i, column in enumerate(filterable):
+            series = data[column]
+            with columns[i % 3]:
+                # Widget keys include the choices, so a new data range starts unfiltered
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    options = list(series.cat.categories)
+                    selected = st.multiselect(column, options, key=f"{key}_{column}_{hash(tuple(options))}")
+                    if selected:
+                        filters[column] = ('in', tuple(selected))
+                elif pd.api.types.is_numeric_dtype(series) and series.notna().any():
+                    low, high = float(series.min()), float(series.max())
+                    if low == high:
+                        continue
+                    chosen = st.slider(column, low, high, (low, high), key=f"{key}_{column}_{low}_{high}")
+                    if chosen != (low, high):
+                        filters[column] = ('between', *chosen)
+    return filters
+
+def create_data_table(data, key, cache_key=None):
+    """Show a frame as a paginated table with sorting, column filters and export
+
+    Filtering, sorting and paging run on the server and only the visible
+    page is sent to the browser. `cache_key` identifies the rows of `data`
+    (filters and data version); with it the sort order and a prepared
+    export are kept in the shared table cache, so moving between pages
+    does not sort again. Without one an export is offered only on the run
+    that prepared it.
+    """
+    filters = _column_filters(data, key)
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by", list(data.columns), key=f"{key}_sort")
+    with col2:
+        descending = st.checkbox("Descending", key=f"{key}_descending")
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+
+    state = None if cache_key is None else (key, cache_key, tuple(sorted(filters.items())), sort_by, descending)
+    with span('table_filter_sort', rows=len(data)) as attrs:
+        rows = apply_table_filters(data, filters)
+        if sort_by == rows.attrs.get('sorted_by') and not descending:
+            order = None
+        else:
+            order = cached_sort_order(state, rows, sort_by, ascending=not descending)
+        attrs['matches'] = len(rows)
+
+    n_pages = max(math.ceil(len(rows) / page_size), 1)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1,
+                               key=f"{key}_page_{n_pages}")
+    first = (page - 1) * page_size
+    with col2:
+        st.caption(f"Rows {min(first + 1, len(rows)):,}–{min(first + page_size, len(rows)):,} "
+                   f"of {len(rows):,} (page {page} of {n_pages})")
+
+    page_rows = table_page(rows, order, page - 1, page_size)
+    with span('st.dataframe', rows=len(page_rows)):
+        st.dataframe(page_rows, use_container_width=True)
+
+    # Exports are encoded on request and cover every page of the current view
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox("Export format", EXPORT_FORMATS, key=f"{key}_export_format")
+    export_key = None if state is None else (state, fmt)
+    export = None
+    with col2:
+        if st.button(f"Prepare {fmt} export", key=f"{key}_prepare_export"):
+            with span('export_table', rows=len(rows), format=fmt):
+                ordered = rows if order is None else rows.iloc[order]
+                export = export_table(ordered, fmt)
+            if export_key is not None:
+                store_export(export_key, export)
+                st.session_state[f"{key}_export"] = export_key
+        elif export_key is not None and st.session_state.get(f"{key}_export") == export_key:
+            export = cached_export(export_key)
+        if export is not None:
+            st.download_button(f"Download {len(rows):,} rows as {fmt}", export,
+                               file_name=f"{key}.{fmt.lower()}", mime=EXPORT_MIME_TYPES[fmt])
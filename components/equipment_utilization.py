@@ -3,25 +3,132 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.calculations import calculate_equipment_efficiency
+from utils.downsampling import downsample_frame
+from utils.equipment_kpis import build_equipment_kpis
+from utils.profiling import span
+from components.data_table import create_data_table
+from components.profiler import plotly_chart
+from utils.figure_cache import cached_figures
+from utils.rollups import pick_grain
 
-def create_equipment_utilization(equipment_data):
-    """Create equipment utilization dashboard"""
+KPI_LABELS = {
+    'availability': 'Availability',
+    'use_of_availability': 'Use of Availability',
+    'utilization_rate': 'Utilization',
+    'oee': 'OEE',
+}
+# Columns of the per-unit KPI table
+UNIT_COLUMNS = ['records', 'availability', 'use_of_availability', 'utilization_rate', 'oee',
+                'operating_hours', 'maintenance_hours', 'downtime_hours']
+
+def _unit_keys(kpis):
+    """Return the keys identifying a unit; unit ids repeat across mines, so the site is one of them"""
+    return (['site'] if 'site' in kpis.keys else []) + ['equipment_type', 'equipment_id']
+
+def build_equipment_figures(equipment_data, kpis):
+    """Build the equipment utilization figures, keyed by chart, without rendering them
+
+    Every chart is drawn from the KPI sums in `kpis`; the breakdown by
+    equipment type is computed once and shared.
+    """
+    figures = {}
+    by_type = kpis.summarize('equipment_type')
+    
+    figures['type_utilization'] = px.bar(by_type, x='equipment_type', y='utilization_rate',
+                                         title='Average Utilization by Equipment Type',
+                                         labels={'utilization_rate': 'Utilization Rate (%)', 
+                                                'equipment_type': 'Equipment Type'})
+    
+    # Time series of utilization; summary data has no dates to plot
+    # Long ranges are plotted from weekly or monthly sums
+    if kpis.dated and not kpis.empty:
+        periods = kpis.frame['period']
+        grain = pick_grain(periods.iloc[0], periods.iloc[-1])
+        daily_utilization = kpis.summarize(['period', 'equipment_type'], grain)[
+            ['period', 'equipment_type', 'utilization_rate']].rename(columns={'period': 'date'})
+        daily_utilization = downsample_frame(daily_utilization, 'date', 'utilization_rate', group='equipment_type')
+        figures['utilization_over_time'] = px.line(daily_utilization, x='date', y='utilization_rate',
+                                                   color='equipment_type',
+                                                   title='Utilization Rate Over Time',
+                                                   labels={'utilization_rate': 'Utilization Rate (%)', 'date': 'Date'})
+    
+    hours = [column for column in ('maintenance_hours', 'downtime_hours') if column in kpis.measures]
+    figures['maintenance_downtime'] = px.bar(by_type, x='equipment_type', 
+                                             y=hours,
+                                             title='Average Maintenance & Downtime by Equipment Type',
+                                             labels={'value': 'Hours', 'equipment_type': 'Equipment Type'})
+    
+    # Fuel consumption analysis - only if column exists
+    if 'fuel_consumption' in kpis.measures:
+        figures['consumption_share'] = px.pie(by_type, values='fuel_consumption', names='equipment_type',
+                                              title='Fuel Consumption Distribution by Equipment Type')
+    else:
+        # Alternative: Show operating hours distribution instead
+        figures['consumption_share'] = px.pie(by_type, values='hours_operated', names='equipment_type',
+                                              title='Operating Hours Distribution by Equipment Type')
+    
+    # Without a performance_rate OEE would only repeat utilization, so it is
+    # charted for rated data only
+    kpi_columns = ['availability', 'use_of_availability'] + (['oee'] if kpis.rated else [])
+    kpi_title = ', '.join(KPI_LABELS[column] for column in kpi_columns[:-1]) + f" & {KPI_LABELS[kpi_columns[-1]]}"
+    figures['type_kpis'] = px.bar(by_type.rename(columns=KPI_LABELS), x='equipment_type',
+                                  y=[KPI_LABELS[column] for column in kpi_columns], barmode='group',
+                                  title=f'{kpi_title} by Equipment Type',
+                                  labels={'value': 'Percent (%)', 'equipment_type': 'Equipment Type',
+                                          'variable': 'KPI'})
+    
+    # Shift data gets a per-shift breakdown, otherwise availability is shown per unit
+    if 'shift' in kpis.keys:
+        by_shift = kpis.summarize('shift').rename(columns=KPI_LABELS)
+        figures['kpi_breakdown'] = px.bar(by_shift, x='shift', y=[KPI_LABELS[column] for column in kpi_columns],
+                                          barmode='group', title=f'{kpi_title} by Shift',
+                                          labels={'value': 'Percent (%)', 'shift': 'Shift', 'variable': 'KPI'})
+    else:
+        by_unit = kpis.summarize(_unit_keys(kpis))
+        figures['kpi_breakdown'] = px.scatter(by_unit, x='availability', y='use_of_availability',
+                                              color='equipment_type', hover_name='equipment_id',
+                                              symbol='site' if 'site' in by_unit.columns else None,
+                                              title='Availability vs Use of Availability by Unit',
+                                              labels={'availability': 'Availability (%)',
+                                                      'use_of_availability': 'Use of Availability (%)',
+                                                      'equipment_type': 'Equipment Type'})
+    return figures
+
+def create_equipment_utilization(equipment_data, kpis=None, cache_key=None):
+    """Create equipment utilization dashboard
+
+    `kpis` are the equipment KPI sums (see utils/equipment_kpis.py) for
+    the same rows as `equipment_data`; they are built on the fly when not
+    supplied. With a `cache_key` identifying the active filters and data
+    version, the figures are served from the figure cache on repeat visits.
+    """
     
     st.header("🏗️ Equipment Utilization Analysis")
     
+    if equipment_data.empty:
+        st.info("No equipment data in the selected date range.")
+        return
+    
+    if kpis is None:
+        kpis = build_equipment_kpis(equipment_data)
+    
     # Key metrics
-    efficiency = calculate_equipment_efficiency(equipment_data)
+    efficiency = calculate_equipment_efficiency(kpis)
     
-    col1, col2, col3, col4 = st.columns(4)
+    metrics = [("Availability", f"{efficiency['availability']:.1f}%"),
+               ("Avg Utilization", f"{efficiency['avg_utilization']:.1f}%")]
+    # OEE equals utilization unless performance was recorded
+    if kpis.rated:
+        metrics.append(("OEE", f"{efficiency['oee']:.1f}%"))
+    metrics += [("Avg Downtime", f"{efficiency['avg_downtime']:.1f}hrs/day"),
+                ("Avg Maintenance", f"{efficiency['avg_maintenance']:.1f}hrs/day"),
+                ("Total Operating Hours", f"{efficiency['total_operating_hours']:.0f}hrs")]
+    for column, (label, value) in zip(st.columns(len(metrics)), metrics):
+        with column:
+            st.metric(label, value)
     
-    with col1:
-        st.metric("Avg Utilization", f"{efficiency['avg_utilization']:.1f}%")
-    with col2:
-        st.metric("Avg Downtime", f"{efficiency['avg_downtime']:.1f}hrs/day")
-    with col3:
-        st.metric("Avg Maintenance", f"{efficiency['avg_maintenance']:.1f}hrs/day")
-    with col4:
-        st.metric("Total Operating Hours", f"{efficiency['total_operating_hours']:.0f}hrs")
+    with span('build_equipment_figures', rows=len(equipment_data)):
+        figures = cached_figures('equipment', cache_key, lambda: build_equipment_figures(equipment_data, kpis))
     
     # Utilization by equipment type
     st.subheader("Utilization by Equipment Type")
@@ -29,20 +136,13 @@ def create_equipment_utilization(equipment_data):
     col1, col2 = st.columns(2)
     
     with col1:
-        type_utilization = equipment_data.groupby('equipment_type')['utilization_rate'].mean().reset_index()
-        fig = px.bar(type_utilization, x='equipment_type', y='utilization_rate',
-                    title='Average Utilization by Equipment Type',
-                    labels={'utilization_rate': 'Utilization Rate (%)', 
-                           'equipment_type': 'Equipment Type'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['type_utilization'], 'type_utilization', use_container_width=True)
     
     with col2:
-        # Time series of utilization
-        daily_utilization = equipment_data.groupby(['date', 'equipment_type'])['utilization_rate'].mean().reset_index()
-        fig = px.line(daily_utilization, x='date', y='utilization_rate', color='equipment_type',
-                     title='Utilization Rate Over Time',
-                     labels={'utilization_rate': 'Utilization Rate (%)', 'date': 'Date'})
-        st.plotly_chart(fig, use_container_width=True)
+        if 'utilization_over_time' in figures:
+            plotly_chart(figures['utilization_over_time'], 'utilization_over_time', use_container_width=True)
+        else:
+            st.info("Summary equipment data has no dates to chart over time.")
     
     # Maintenance and downtime analysis
     st.subheader("Maintenance & Downtime Analysis")
@@ -50,27 +150,25 @@ def create_equipment_utilization(equipment_data):
     col1, col2 = st.columns(2)
     
     with col1:
-        maintenance_data = equipment_data.groupby('equipment_type').agg({
-            'maintenance_hours': 'mean',
-            'downtime_hours': 'mean'
-        }).reset_index()
-        
-        fig = px.bar(maintenance_data, x='equipment_type', 
-                    y=['maintenance_hours', 'downtime_hours'],
-                    title='Average Maintenance & Downtime by Equipment Type',
-                    labels={'value': 'Hours', 'equipment_type': 'Equipment Type'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['maintenance_downtime'], 'maintenance_downtime', use_container_width=True)
     
     with col2:
-        # Fuel consumption analysis - only if column exists
-        if 'fuel_consumption' in equipment_data.columns:
-            fuel_data = equipment_data.groupby('equipment_type')['fuel_consumption'].mean().reset_index()
-            fig = px.pie(fuel_data, values='fuel_consumption', names='equipment_type',
-                        title='Fuel Consumption Distribution by Equipment Type')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            # Alternative: Show operating hours distribution instead
-            hours_data = equipment_data.groupby('equipment_type')['hours_operated'].mean().reset_index()
-            fig = px.pie(hours_data, values='hours_operated', names='equipment_type',
-                        title='Operating Hours Distribution by Equipment Type')
-            st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['consumption_share'], 'consumption_share', use_container_width=True)
+    
+    # Availability and OEE
+    st.subheader("Availability & OEE" if kpis.rated else "Availability")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        plotly_chart(figures['type_kpis'], 'type_kpis', use_container_width=True)
+    
+    with col2:
+        plotly_chart(figures['kpi_breakdown'], 'kpi_breakdown', use_container_width=True)
+    
+    st.subheader("KPIs by Unit")
+    with span('unit_kpis'):
+        keys = _unit_keys(kpis)
+        by_unit = kpis.summarize(keys)
+        by_unit = by_unit[keys + [c for c in UNIT_COLUMNS if c in by_unit.columns]]
+    create_data_table(by_unit.round(1), 'equipment_units', cache_key)
@@ -0,0 +1,99 @@
+import json
+import streamlit as st
+import pandas as pd
+from utils.figure_cache import figure_cache_stats
+from utils.profiling import span, profiling_enabled, chrome_trace
+from utils.tables import table_cache_stats
+
+# Reruns kept per session for the trace export
+PROFILE_HISTORY = 20
+
+# Streamlit versions whose chart message _send_plotly_spec builds; checked by
+# tests/test_plotly_spec.py against what st.plotly_chart sends
+SPEC_STREAMLIT_VERSIONS = ('1.28',)
+
+try:
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    PlotlyChartProto = None
+
+def spec_supported():
+    """Return whether serialized specs can be sent without going back through st.plotly_chart"""
+    version = '.'.join(st.__version__.split('.')[:2])
+    return PlotlyChartProto is not None and version in SPEC_STREAMLIT_VERSIONS
+
+def _send_plotly_spec(spec, use_container_width=False, **kwargs):
+    """Send an already serialized figure the way st.plotly_chart would, without re-encoding it
+
+    st.plotly_chart validates and encodes a figure again on every call,
+    which for a cached spec costs more than building the figure did. This
+    builds the chart message of the supported Streamlit versions directly
+    and is the only place the dashboard relies on Streamlit internals;
+    other versions decode the spec and go through st.plotly_chart.
+    """
+    if not spec_supported():
+        st.plotly_chart(json.loads(spec), use_container_width=use_container_width, **kwargs)
+        return
+    theme = kwargs.pop('theme', 'streamlit')
+    config = dict(kwargs.pop('config', {}))
+    config.setdefault('showLink', kwargs.pop('show_link', False))
+    config.setdefault('linkText', kwargs.pop('link_text', False))
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.figure.spec = spec
+    proto.figure.config = json.dumps(config)
+    proto.theme = theme or ''
+    st._main._enqueue('plotly_chart', proto)
+
+def plotly_chart(fig, name, **kwargs):
+    """Render a Plotly figure or serialized figure spec, timing it and recording its JSON size when profiling
+
+    For figures the size is measured with an extra fig.to_json() call,
+    which is only made while profiling is on. Specs from the figure cache
+    are sent as they are.
+    """
+    with span('st.plotly_chart', chart=name) as attrs:
+        if isinstance(fig, str):
+            attrs['figure_bytes'] = len(fig)
+            _send_plotly_spec(fig, **kwargs)
+            return
+        if profiling_enabled():
+            attrs['figure_bytes'] = len(fig.to_json())
+        st.plotly_chart(fig, **kwargs)
+
+def remember_profile(profile):
+    """Append a finished rerun profile to this session's history"""
+    history = st.session_state.setdefault('render_profiles', [])
+    history.append(profile)
+    del history[:-PROFILE_HISTORY]
+    return history
+
+def create_profiler_panel(profile, history):
+    """Show the spans of the last rerun in a collapsible sidebar panel"""
+    with st.sidebar.expander(f"⏱️ Render Profile ({profile.total() * 1000:.0f} ms)", expanded=False):
+        rows = []
+        for s in sorted(profile.spans, key=lambda s: s['start']):
+            rows.append({
+                'stage': '· ' * s['depth'] + s['name'],
+                'ms': round(s['duration'] * 1000, 1),
+                'rows': s['args'].get('rows'),
+                'figure KB': round(s['args']['figure_bytes'] / 1024, 1) if 'figure_bytes' in s['args'] else None,
+                'detail': ', '.join(f"{k}={v}" for k, v in s['args'].items()
+                                    if k not in ('rows', 'figure_bytes')),
+            })
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        cache = figure_cache_stats()
+        st.caption(f"Figure cache: {cache['hits']} hits, {cache['misses']} misses, "
+                   f"{cache['evictions']} evictions, {cache['entries']} views in "
+                   f"{cache['mb']:.1f} of {cache['max_mb']:.0f} MB")
+        cache = table_cache_stats()
+        st.caption(f"Table cache: {cache['hits']} hits, {cache['misses']} misses, "
+                   f"{cache['evictions']} evictions, {cache['entries']} orders and exports in "
+                   f"{cache['mb']:.1f} of {cache['max_mb']:.0f} MB")
+        st.download_button(
+            f"Export trace ({len(history)} reruns)",
+            json.dumps(chrome_trace(history)),
+            file_name='dashboard-trace.json',
+            mime='application/json',
+            help='Chrome trace format; open in chrome://tracing or ui.perfetto.dev',
+        )
@@ -3,14 +3,86 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.calculations import calculate_stope_statistics
+from utils.downsampling import downsample_frame
+from utils.distributions import histogram_bins, box_statistics
+from utils.profiling import span
+from components.profiler import plotly_chart
+from components.data_table import create_data_table
+from utils.figure_cache import cached_figures
+from utils.rollups import build_rollups
 
-def create_stope_analysis(stope_data):
-    """Create stope width analysis dashboard"""
+def build_stope_figures(stope_data, rollups):
+    """Build the stope analysis figures, keyed by chart, without rendering them"""
+    figures = {}
+    
+    # Time series of stope widths; stope ids repeat across mines, so each
+    # site's stopes are separate series
+    site = 'site' if 'site' in stope_data.columns else None
+    width_series = downsample_frame(stope_data, 'date', 'stope_width',
+                                    group=['site', 'stope_id'] if site else 'stope_id')
+    figures['width_over_time'] = px.line(width_series, x='date', y='stope_width', color='stope_id', line_dash=site,
+                                         title='Stope Width Over Time',
+                                         labels={'stope_width': 'Width (m)', 'date': 'Date'})
+    
+    # Distribution of stope widths
+    # Binned here rather than in the browser, so the figure holds bin counts
+    # instead of every measurement
+    bins = histogram_bins(stope_data['stope_width'])
+    fig = go.Figure(go.Bar(x=(bins['bin_start'] + bins['bin_end']) / 2,
+                           y=bins['count'],
+                           width=bins['bin_end'] - bins['bin_start'],
+                           customdata=bins[['bin_start', 'bin_end']],
+                           hovertemplate='Width (m)=%{customdata[0]:.2f}-%{customdata[1]:.2f}<br>count=%{y}<extra></extra>'))
+    fig.update_layout(title='Distribution of Stope Widths', xaxis_title='Width (m)', yaxis_title='count', bargap=0)
+    figures['width_distribution'] = fig
+    
+    zone_avg = rollups[('day', ('zone',))].mean('stope_width', by='zone')
+    figures['zone_average'] = px.bar(zone_avg, x='zone', y='stope_width',
+                                     title='Average Stope Width by Zone',
+                                     labels={'stope_width': 'Average Width (m)', 'zone': 'Zone'})
+    
+    # Quartiles and whiskers per zone, plus the most extreme outliers
+    box_stats, outliers = box_statistics(stope_data, 'stope_width', 'zone')
+    color = px.colors.qualitative.Plotly[0]
+    fig = go.Figure()
+    fig.add_trace(go.Box(x=box_stats['zone'].astype(object),
+                         q1=box_stats['q1'],
+                         median=box_stats['median'],
+                         q3=box_stats['q3'],
+                         lowerfence=box_stats['lowerfence'],
+                         upperfence=box_stats['upperfence'],
+                         name='Width',
+                         marker_color=color))
+    fig.add_trace(go.Scatter(x=outliers['zone'].astype(object),
+                             y=outliers['stope_width'],
+                             mode='markers',
+                             name='Outliers',
+                             marker=dict(color=color, size=4)))
+    fig.update_layout(title='Stope Width Distribution by Zone', xaxis_title='Zone', yaxis_title='Width (m)',
+                      showlegend=False)
+    figures['zone_distribution'] = fig
+    return figures
+
+def create_stope_analysis(stope_data, rollups=None, cache_key=None):
+    """Create stope width analysis dashboard
+
+    `rollups` are the stope rollup cubes for the same rows as `stope_data`;
+    they are built on the fly when not supplied. With a `cache_key`
+    identifying the active filters and data version, the figures are
+    served from the figure cache on repeat visits.
+    """
     
     st.header("📊 Stope Width Analysis")
     
+    if stope_data.empty:
+        st.info("No stope data in the selected date range.")
+        return
+    
+    if rollups is None:
+        rollups = build_rollups('stope', stope_data)
+    
     # Key metrics
-    stats = calculate_stope_statistics(stope_data)
+    stats = calculate_stope_statistics(rollups[('day', ())])
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -23,22 +95,17 @@ def create_stope_analysis(stope_data):
     with col4:
         st.metric("Max Width", f"{stats['max_width']:.2f}m")
     
+    with span('build_stope_figures', rows=len(stope_data)):
+        figures = cached_figures('stope', cache_key, lambda: build_stope_figures(stope_data, rollups))
+    
     # Charts
     col1, col2 = st.columns(2)
     
     with col1:
-        # Time series of stope widths
-        fig = px.line(stope_data, x='date', y='stope_width', color='stope_id',
-                     title='Stope Width Over Time',
-                     labels={'stope_width': 'Width (m)', 'date': 'Date'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['width_over_time'], 'width_over_time', use_container_width=True)
     
     with col2:
-        # Distribution of stope widths
-        fig = px.histogram(stope_data, x='stope_width', 
-                          title='Distribution of Stope Widths',
-                          labels={'stope_width': 'Width (m)'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['width_distribution'], 'width_distribution', use_container_width=True)
     
     # Zone analysis
     st.subheader("Zone-wise Analysis")
@@ -46,18 +113,11 @@ def create_stope_analysis(stope_data):
     col1, col2 = st.columns(2)
     
     with col1:
-        zone_avg = stope_data.groupby('zone')['stope_width'].mean().reset_index()
-        fig = px.bar(zone_avg, x='zone', y='stope_width',
-                    title='Average Stope Width by Zone',
-                    labels={'stope_width': 'Average Width (m)', 'zone': 'Zone'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['zone_average'], 'zone_average', use_container_width=True)
     
     with col2:
-        fig = px.box(stope_data, x='zone', y='stope_width',
-                    title='Stope Width Distribution by Zone',
-                    labels={'stope_width': 'Width (m)', 'zone': 'Zone'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(figures['zone_distribution'], 'zone_distribution', use_container_width=True)
     
     # Data table
     st.subheader("Raw Data")
-    st.dataframe(stope_data, use_container_width=True)
+    create_data_table(stope_data, 'stope_raw', cache_key)
@@ -0,0 +1,52 @@
+import os
+import pandas as pd
+from utils import data_loader
+from utils.data_loader import load_dataset
+from utils.rollups import get_rollups
+
+def _stope_row(day, width):
+    return {'date': f'2024-01-{day:02d}', 'stope_id': 'STOPE_01', 'stope_width': width,
+            'rock_density': 2.8, 'depth': 100.0, 'zone': 'North'}
+
+def _write(path, rows, step, append=False):
+    pd.DataFrame(rows).to_csv(path, mode='a' if append else 'w', header=not append, index=False)
+    # Distinct mtimes, so each write is a new version even within one clock tick
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + step * 10**9))
+
+def test_rollups_after_out_of_order_append(tmp_path):
+    csv_file = tmp_path / 'stope_data.csv'
+    _write(csv_file, [_stope_row(day, 10.0) for day in range(1, 11)], step=1)
+    get_rollups('stope', load_dataset('stope', str(tmp_path)))
+
+    # An in-order append is folded into the cached rollups
+    _write(csv_file, [_stope_row(20, 20.0)], step=2, append=True)
+    get_rollups('stope', load_dataset('stope', str(tmp_path)))
+
+    # A late-dated row re-sorts the frame, so the rollups must be rebuilt
+    _write(csv_file, [_stope_row(5, 30.0)], step=3, append=True)
+    data = load_dataset('stope', str(tmp_path))
+    cube = get_rollups('stope', data)[('day', ())]
+
+    assert len(data) == 12
+    assert data['date'].is_monotonic_increasing
+    assert cube.rows == 12
+    assert cube.totals('stope_width')['sum'] == 150.0
+
+def test_rows_appended_while_loading_are_read_once(tmp_path, monkeypatch):
+    csv_file = tmp_path / 'stope_data.csv'
+    _write(csv_file, [_stope_row(day, 10.0) for day in range(1, 11)], step=1)
+
+    # The exporter appends a row right after the loader has sized the file
+    sized = data_loader.dataset_fingerprint
+    def size_then_append(name, data_dir=data_loader.DATA_DIR):
+        fingerprint = sized(name, data_dir)
+        monkeypatch.setattr(data_loader, 'dataset_fingerprint', sized)
+        _write(csv_file, [_stope_row(11, 10.0)], step=2, append=True)
+        return fingerprint
+    monkeypatch.setattr(data_loader, 'dataset_fingerprint', size_then_append)
+
+    assert len(load_dataset('stope', str(tmp_path))) == 10
+    data = load_dataset('stope', str(tmp_path))
+    assert len(data) == len(pd.read_csv(csv_file)) == 11
+    assert data['date'].is_unique
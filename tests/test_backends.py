@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from utils.data_loader import write_sample_data
+from utils.query_engine import FrameEngine, SQLiteEngine
+from utils.rollups import GRAINS, ROLLUP_SPECS
+
+# 2024-01-07 is a Sunday, so this range ends a week and starts the next one
+RANGES = [(None, None), ('2024-01-07', '2024-01-08'), ('2024-01-15', '2024-02-10')]
+
+def _assert_same(a, b):
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False, rtol=1e-6)
+
+@pytest.fixture(params=['single', 'sites'])
+def engines(request, tmp_path):
+    if request.param == 'single':
+        write_sample_data(str(tmp_path), n_stopes=3, n_blasts=2, units_per_type=2, end='2024-03-01')
+        sites = [None]
+    else:
+        write_sample_data(str(tmp_path / 'mineA'), n_stopes=3, n_blasts=2, units_per_type=2,
+                          end='2024-03-01', seed=1)
+        write_sample_data(str(tmp_path / 'mineB'), n_stopes=2, n_blasts=2, units_per_type=1,
+                          end='2024-02-15', seed=2)
+        sites = [None, ['mineA'], ['mineB']]
+    return FrameEngine(str(tmp_path)), SQLiteEngine(str(tmp_path)), sites
+
+@pytest.mark.parametrize('name', ['stope', 'blast'])
+def test_rollups_match(engines, name):
+    frame, sql, site_choices = engines
+    for start, end in RANGES:
+        for sites in site_choices:
+            expected = frame.rollups(name, start, end, sites)
+            actual = sql.rollups(name, start, end, sites)
+            assert set(expected) == set(actual) == {(g, d) for g in GRAINS for d in ROLLUP_SPECS[name]['dimensions']}
+            for key, cube in expected.items():
+                _assert_same(cube.frame, actual[key].frame)
+
+    # Day cubes cover both days of the boundary range; a week is kept when it starts inside it
+    cubes = sql.rollups(name, *RANGES[1])
+    assert cubes[('day', ())].frame['period'].nunique() == 2
+    assert list(cubes[('week', ())].frame['period'].unique()) == [pd.Timestamp('2024-01-08')]
+
+def test_equipment_kpis_match(engines):
+    frame, sql, site_choices = engines
+    for start, end in RANGES:
+        for sites in site_choices:
+            expected = frame.equipment_kpis(start, end, sites)
+            actual = sql.equipment_kpis(start, end, sites)
+            for by, grain in ([], 'day'), ('equipment_type', 'day'), (['period', 'equipment_id'], 'week'):
+                _assert_same(expected.summarize(by, grain), actual.summarize(by, grain))
+
+@pytest.mark.parametrize('name', ['stope', 'blast', 'equipment'])
+def test_fetch_matches(engines, name):
+    frame, sql, site_choices = engines
+    for start, end in RANGES:
+        for sites in site_choices:
+            expected = frame.fetch(name, start, end, sites)
+            actual = sql.fetch(name, start, end, sites)
+            assert list(expected.columns) == list(actual.columns)
+            _assert_same(expected, actual[expected.columns])
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from utils.downsampling import downsample_frame, lttb_indices, min_max_indices
+
+def test_reductions_stay_within_budget():
+    rng = np.random.default_rng(0)
+    for n in (1001, 1002, 5000):
+        y = rng.normal(size=n)
+        x = np.arange(n, dtype='float64')
+        for indices in (min_max_indices(y, 1000), lttb_indices(x, y, 1000)):
+            assert 4 < len(indices) <= 1000
+            assert indices[0] == 0 and indices[-1] == n - 1
+
+def test_min_max_keeps_extremes():
+    y = np.sin(np.linspace(0, 20, 10001))
+    y[1234] = 5.0
+    y[8765] = -5.0
+    indices = min_max_indices(y, 100)
+    assert len(indices) <= 100
+    assert {1234, 8765} <= set(indices)
+
+def test_downsample_frame_per_series():
+    days = pd.date_range('2024-01-01', periods=3000, freq='h')
+    df = pd.DataFrame({'date': np.tile(days, 2), 'width': np.arange(6000, dtype='float64'),
+                       'stope_id': np.repeat(['STOPE_01', 'STOPE_02'], 3000)})
+    reduced = downsample_frame(df, 'date', 'width', group='stope_id', n_out=500)
+    assert reduced.groupby('stope_id')['width'].size().le(500).all()
+    assert reduced.index.is_monotonic_increasing
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+from utils.equipment_kpis import build_equipment_kpis, extend_equipment_kpis
+
+def _records(**columns):
+    rows = {'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02']),
+            'equipment_id': ['Truck_01', 'Drill_01', 'Truck_01'],
+            'equipment_type': ['Truck', 'Drill Rig', 'Truck'],
+            'hours_operated': [12.0, 18.0, 6.0],
+            'maintenance_hours': [2.0, 0.0, 4.0],
+            'downtime_hours': [1.0, 0.0, 2.0]}
+    rows.update(columns)
+    return pd.DataFrame(rows)
+
+def test_kpi_ratios():
+    kpis = build_equipment_kpis(_records(performance_rate=[80.0, 100.0, 50.0]))
+    totals = kpis.totals()
+    # 72 calendar hours, 9 lost to maintenance and downtime, 36 operated, 9.6 + 18 + 3 effective
+    assert totals['availability'] == pytest.approx(100 * 63 / 72)
+    assert totals['use_of_availability'] == pytest.approx(100 * 36 / 63)
+    assert totals['utilization_rate'] == pytest.approx(100 * 36 / 72)
+    assert totals['performance'] == pytest.approx(100 * 30.6 / 36)
+    assert totals['oee'] == pytest.approx(100 * 30.6 / 72)
+    assert totals['operating_hours'] == 36.0
+    assert totals['maintenance_hours'] == pytest.approx(2.0)
+
+    truck = kpis.summarize('equipment_type').set_index('equipment_type').loc['Truck']
+    assert truck['availability'] == pytest.approx(100 * 39 / 48)
+    assert truck['oee'] == pytest.approx(100 * 12.6 / 48)
+
+def test_kpis_without_performance_or_hours():
+    kpis = build_equipment_kpis(_records(shift=['Day', 'Day', 'Night']).drop(columns='hours_operated')
+                                .assign(utilization_rate=[50.0, 75.0, 25.0]))
+    totals = kpis.totals()
+    assert not kpis.rated
+    assert 'oee' not in totals
+    # Shift records cover 12 hours, so operated hours come from utilization_rate of 12
+    assert totals['operating_hours'] == pytest.approx(6 + 9 + 3)
+    assert totals['utilization_rate'] == pytest.approx(100 * 18 / 36)
+    assert totals['availability'] == pytest.approx(100 * 27 / 36)
+
+def test_extend_matches_rebuild():
+    records = _records()
+    later = _records().assign(date=pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-03']))
+    extended = extend_equipment_kpis(build_equipment_kpis(records), later)
+    rebuilt = build_equipment_kpis(pd.concat([records, later], ignore_index=True))
+    pd.testing.assert_frame_equal(extended.frame, rebuilt.frame, check_categorical=False)
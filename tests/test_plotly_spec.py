@@ -0,0 +1,37 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+from components.profiler import spec_supported
+
+def _render_both():
+    import plotly.express as px
+    import streamlit as st
+    from components.profiler import plotly_chart
+    from utils.figure_cache import serialize_figure
+
+    fig = px.scatter(x=[1.5, 2.0, 3.25], y=[4, 5, 6], color=['a', 'b', 'a'], title='Widths')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        plotly_chart(serialize_figure(fig), 'spec', use_container_width=True)
+    st.plotly_chart(fig, theme=None, config={'displayModeBar': False})
+    plotly_chart(serialize_figure(fig), 'spec', theme=None, config={'displayModeBar': False})
+
+@pytest.mark.skipif(not spec_supported(), reason='specs go through st.plotly_chart')
+def test_spec_is_sent_as_st_plotly_chart_sends_the_figure():
+    at = AppTest.from_function(_render_both).run()
+    assert not at.exception
+    charts = [chart.proto for chart in at.get('plotly_chart')]
+    assert len(charts) == 4
+    assert charts[0] == charts[1]
+    assert charts[2] == charts[3]
+    assert charts[0] != charts[2]
+
+def test_spec_goes_through_st_plotly_chart_on_other_versions(monkeypatch):
+    from components import profiler
+    monkeypatch.setattr(profiler, 'SPEC_STREAMLIT_VERSIONS', ())
+    at = AppTest.from_function(_render_both).run()
+    assert not at.exception
+    charts = [chart.proto for chart in at.get('plotly_chart')]
+    assert charts[0].use_container_width and charts[1].use_container_width
+    assert charts[2].theme == charts[3].theme == ''
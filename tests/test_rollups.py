@@ -0,0 +1,25 @@
+import pandas as pd
+from utils.data_loader import generate_sample_stope_data
+from utils.rollups import build_rollups, extend_rollups
+
+def _assert_same_cubes(actual, expected):
+    assert set(actual) == set(expected)
+    for key, cube in expected.items():
+        pd.testing.assert_frame_equal(actual[key].frame, cube.frame, check_categorical=False, rtol=1e-9)
+
+def test_extend_rollups_matches_rebuild():
+    data = generate_sample_stope_data().sort_values('date', kind='stable').reset_index(drop=True)
+    # Split inside a week and a month, so appended rows share periods with existing ones
+    split = data['date'].searchsorted(pd.Timestamp('2024-03-13'))
+    base, new_rows = data.iloc[:split], data.iloc[split:].reset_index(drop=True)
+
+    extended = extend_rollups('stope', build_rollups('stope', base), new_rows)
+    _assert_same_cubes(extended, build_rollups('stope', data))
+
+def test_extend_rollups_by_site():
+    data = generate_sample_stope_data().sort_values('date', kind='stable').reset_index(drop=True)
+    data['site'] = pd.Categorical(['mineA', 'mineB'] * (len(data) // 2) + ['mineA'] * (len(data) % 2))
+    split = len(data) - 7
+    extended = extend_rollups('stope', build_rollups('stope', data.iloc[:split]),
+                              data.iloc[split:].reset_index(drop=True))
+    _assert_same_cubes(extended, build_rollups('stope', data))
@@ -0,0 +1,74 @@
+import glob
+import os
+import shutil
+import pandas as pd
+from utils import data_loader
+from utils.data_loader import SIDECAR_DIR, read_dataset
+
+def _stope_rows(days):
+    return pd.DataFrame({'date': [f'2024-01-{day:02d}' for day in days], 'stope_id': 'STOPE_01',
+                         'stope_width': 10.0, 'rock_density': 2.8, 'depth': 100.0, 'zone': 'North'})
+
+def test_snapshot_is_only_written_when_every_site_loads(tmp_path, monkeypatch):
+    for site in ('north', 'south'):
+        os.makedirs(tmp_path / site)
+        _stope_rows(range(1, 6)).to_csv(tmp_path / site / 'stope_data.csv', index=False)
+    monkeypatch.setattr(data_loader, 'SITE_WORKERS', 1)
+
+    # One site's file fails to parse, so the combined frame is incomplete
+    read_site_file = data_loader._read_site_file
+    def fail_south(name, csv_file):
+        if os.sep + 'south' + os.sep in csv_file:
+            raise ValueError('truncated file')
+        return read_site_file(name, csv_file)
+    monkeypatch.setattr(data_loader, '_read_site_file', fail_south)
+    data, _ = read_dataset('stope', str(tmp_path))
+    assert len(data) == 5
+    assert not glob.glob(str(tmp_path / SIDECAR_DIR / 'stope-sites-*'))
+
+    # Once it parses, both sites are read and the snapshot is kept
+    monkeypatch.setattr(data_loader, '_read_site_file', read_site_file)
+    data, _ = read_dataset('stope', str(tmp_path))
+    assert len(data) == 10
+    assert len(glob.glob(str(tmp_path / SIDECAR_DIR / 'stope-sites-*'))) == 1
+
+def _equipment_rows(days, fuel=None):
+    rows = pd.DataFrame({'date': [f'2024-01-{day:02d}' for day in days], 'equipment_id': 'Truck_01',
+                         'equipment_type': 'Truck', 'hours_operated': 16.0, 'utilization_rate': 66.0})
+    if fuel is not None:
+        rows['fuel_consumption'] = fuel
+    return rows
+
+def test_sites_with_different_columns(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'SITE_WORKERS', 1)
+    for site, fuel, first_day in (('a', 50.0, 1), ('b', None, 3), ('c', 99.0, 5)):
+        os.makedirs(tmp_path / site)
+        _equipment_rows(range(first_day, first_day + 2), fuel).to_csv(tmp_path / site / 'equipment_data.csv',
+                                                                     index=False)
+    # A summary export without dates, like data/equipment_data.csv
+    os.makedirs(tmp_path / 'd')
+    _equipment_rows([1]).drop(columns='date').to_csv(tmp_path / 'd' / 'equipment_data.csv', index=False)
+
+    data, _ = read_dataset('equipment', str(tmp_path))
+    fuel = data.groupby('site', observed=True)['fuel_consumption'].agg(['first', 'count'])
+    assert list(fuel.index) == ['a', 'b', 'c']
+    assert fuel.loc['a', 'first'] == 50.0 and fuel.loc['c', 'first'] == 99.0
+    assert fuel.loc['b', 'count'] == 0
+    assert len(data) == 6
+    assert not data.attrs.get('undated')
+    assert data['date'].is_monotonic_increasing
+
+    # Without site a the fuel column still comes from site c
+    shutil.rmtree(tmp_path / 'a')
+    data, _ = read_dataset('equipment', str(tmp_path))
+    assert data.loc[data['site'] == 'c', 'fuel_consumption'].eq(99.0).all()
+    assert data.loc[data['site'] == 'b', 'fuel_consumption'].isna().all()
+
+def test_undated_sites_stay_undated(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'SITE_WORKERS', 1)
+    for site in ('a', 'b'):
+        os.makedirs(tmp_path / site)
+        _equipment_rows([1]).drop(columns='date').to_csv(tmp_path / site / 'equipment_data.csv', index=False)
+    data, _ = read_dataset('equipment', str(tmp_path))
+    assert len(data) == 2
+    assert data.attrs.get('undated')
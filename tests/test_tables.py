@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from utils import tables
+from utils.sized_cache import SizedCache
+from utils.tables import cached_sort_order, sort_order
+
+def test_sort_orders_are_shared_and_bounded(monkeypatch):
+    # Room for two orders of 100 rows
+    monkeypatch.setattr(tables, '_table_cache', SizedCache(2 * 100 * 8))
+    df = pd.DataFrame({'width': np.random.default_rng(0).random(100)})
+
+    first = cached_sort_order(('a', 1), df, 'width')
+    assert np.array_equal(first, sort_order(df, 'width'))
+    assert cached_sort_order(('a', 1), df, 'width') is first
+    cached_sort_order(('a', 2), df, 'width', ascending=False)
+    cached_sort_order(('a', 3), df, 'width')
+
+    stats = tables.table_cache_stats()
+    assert stats['hits'] == 1
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    assert cached_sort_order(('a', 1), df, 'width') is not first
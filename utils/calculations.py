@@ -1,33 +1,213 @@
 import pandas as pd
 import numpy as np
+from utils.rollups import RollupCube
+from utils.equipment_kpis import EquipmentKPIs
+
+class RunningStats:
+    """Mergeable count/mean/variance/min/max of one column
+
+    Chunks are folded in with Chan et al.'s parallel update of Welford's
+    moments, so statistics can be built chunk by chunk or per partition and
+    merged without revisiting earlier rows. Missing values are ignored.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """Fold an array or Series of new observations into the statistics"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        chunk = RunningStats()
+        chunk.count = len(values)
+        chunk.mean = values.mean()
+        chunk.m2 = ((values - chunk.mean) ** 2).sum()
+        chunk.min = values.min()
+        chunk.max = values.max()
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Combine another accumulator into this one"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @classmethod
+    def from_moments(cls, count, total, sumsq, minimum, maximum):
+        """Build an accumulator from count, sum and sum of squares"""
+        stats = cls()
+        if count:
+            stats.count = int(count)
+            stats.mean = total / count
+            stats.m2 = max(sumsq - total ** 2 / count, 0.0)
+            stats.min = minimum
+            stats.max = maximum
+        return stats
+
+    @property
+    def sum(self):
+        return self.mean * self.count
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), NaN for fewer than two observations"""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def as_dict(self):
+        empty = self.count == 0
+        return {
+            'count': self.count,
+            'mean': np.nan if empty else self.mean,
+            'std': self.std,
+            'min': np.nan if empty else self.min,
+            'max': np.nan if empty else self.max,
+            'sum': self.sum,
+        }
+
+class DatasetStats:
+    """Row count, date range and RunningStats of several columns of a dataset"""
+
+    def __init__(self, columns):
+        self.rows = 0
+        self.first_date = None
+        self.last_date = None
+        self.columns = {column: RunningStats() for column in columns}
+
+    def update(self, df):
+        """Fold a chunk of rows into the statistics"""
+        self.rows += len(df)
+        if 'date' in df.columns and len(df):
+            self._extend_dates(df['date'].min(), df['date'].max())
+        for column, stats in self.columns.items():
+            if column in df.columns:
+                stats.update(df[column])
+        return self
+
+    def merge(self, other):
+        """Combine statistics of another partition into this one"""
+        self.rows += other.rows
+        if other.first_date is not None:
+            self._extend_dates(other.first_date, other.last_date)
+        for column, stats in other.columns.items():
+            self.columns.setdefault(column, RunningStats()).merge(stats)
+        return self
+
+    def _extend_dates(self, first, last):
+        self.first_date = first if self.first_date is None else min(self.first_date, first)
+        self.last_date = last if self.last_date is None else max(self.last_date, last)
+
+    def date_span_days(self):
+        if self.first_date is None:
+            return 0
+        return (self.last_date - self.first_date).days
+
+    @classmethod
+    def from_rollup(cls, cube, columns):
+        """Build statistics from the totals of a rollup cube"""
+        stats = cls([])
+        stats.rows = cube.rows
+        if not cube.empty:
+            stats._extend_dates(cube.frame['period'].iloc[0], cube.frame['period'].iloc[-1])
+        for column in columns:
+            totals = cube.totals(column)
+            stats.columns[column] = RunningStats.from_moments(
+                totals['count'], totals['sum'], totals['sumsq'], totals['min'], totals['max'])
+        return stats
+
+    @classmethod
+    def from_chunks(cls, chunks, columns):
+        """Accumulate statistics over an iterable of DataFrame chunks"""
+        stats = cls(columns)
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+def dataset_stats(source, columns):
+    """Return DatasetStats for a DataFrame, RollupCube or existing DatasetStats"""
+    if isinstance(source, DatasetStats):
+        return source
+    if isinstance(source, RollupCube):
+        return DatasetStats.from_rollup(source, columns)
+    return DatasetStats(columns).update(source)
 
 def calculate_stope_statistics(df):
-    """Calculate comprehensive stope statistics"""
+    """Calculate comprehensive stope statistics
+
+    `df` is the raw stope frame, a rollup cube of it or DatasetStats.
+    """
+    width = dataset_stats(df, ['stope_width']).columns['stope_width'].as_dict()
     stats = {
-        'mean_width': df['stope_width'].mean(),
-        'std_width': df['stope_width'].std(),
-        'min_width': df['stope_width'].min(),
-        'max_width': df['stope_width'].max(),
-        'width_variation': df['stope_width'].std() / df['stope_width'].mean() * 100
+        'mean_width': width['mean'],
+        'std_width': width['std'],
+        'min_width': width['min'],
+        'max_width': width['max'],
+        'width_variation': width['std'] / width['mean'] * 100
     }
     return stats
 
 def calculate_equipment_efficiency(df):
-    """Calculate equipment efficiency metrics"""
+    """Calculate equipment efficiency metrics
+
+    `df` is the raw equipment frame, a rollup cube of it, DatasetStats or
+    EquipmentKPIs. Given KPIs, utilization is the ratio of operated to
+    calendar hours, and availability, use of availability and OEE are
+    added; OEE is NaN unless the data has a performance_rate.
+    """
+    if isinstance(df, EquipmentKPIs):
+        totals = df.totals()
+        return {
+            'avg_utilization': totals['utilization_rate'],
+            'avg_downtime': totals.get('downtime_hours', np.nan),
+            'avg_maintenance': totals.get('maintenance_hours', np.nan),
+            'total_operating_hours': totals['operating_hours'],
+            'availability': totals['availability'],
+            'use_of_availability': totals['use_of_availability'],
+            'oee': totals.get('oee', np.nan),
+        }
+    columns = dataset_stats(df, ['utilization_rate', 'downtime_hours',
+                                 'maintenance_hours', 'hours_operated']).columns
     efficiency_metrics = {
-        'avg_utilization': df['utilization_rate'].mean(),
-        'avg_downtime': df['downtime_hours'].mean(),
-        'avg_maintenance': df['maintenance_hours'].mean(),
-        'total_operating_hours': df['hours_operated'].sum()
+        'avg_utilization': columns['utilization_rate'].as_dict()['mean'],
+        'avg_downtime': columns['downtime_hours'].as_dict()['mean'],
+        'avg_maintenance': columns['maintenance_hours'].as_dict()['mean'],
+        'total_operating_hours': columns['hours_operated'].sum
     }
     return efficiency_metrics
 
 def calculate_blast_efficiency(df):
-    """Calculate blast efficiency metrics"""
+    """Calculate blast efficiency metrics
+
+    `df` is the raw blast frame, a rollup cube of it or DatasetStats.
+    """
+    stats = dataset_stats(df, ['fragmentation_size', 'explosives_used', 'vibration_level'])
     efficiency_metrics = {
-        'avg_fragmentation': df['fragmentation_size'].mean(),
-        'avg_explosives': df['explosives_used'].mean(),
-        'avg_vibration': df['vibration_level'].mean(),
-        'blast_frequency': len(df) / (df['date'].max() - df['date'].min()).days
+        'avg_fragmentation': stats.columns['fragmentation_size'].as_dict()['mean'],
+        'avg_explosives': stats.columns['explosives_used'].as_dict()['mean'],
+        'avg_vibration': stats.columns['vibration_level'].as_dict()['mean'],
+        # A single-day range still counts as one day of blasting
+        'blast_frequency': stats.rows / max(stats.date_span_days(), 1)
     }
     return efficiency_metrics
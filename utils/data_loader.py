@@ -1,68 +1,160 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import os
+import glob
+import hashlib
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import io
+import sys
+import time
+from pandas.api.types import union_categoricals
+from utils.dates import date_bounds
+from utils.ingest import capture_state, open_prefix, read_appended
+from utils.profiling import span
 
-def generate_sample_stope_data():
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DATA_DIR = 'data'
+DATASETS = ('stope', 'blast', 'equipment')
+
+ZONES = ['North', 'South', 'East', 'West']
+EQUIPMENT_TYPES = ['Drill Rig', 'LHD', 'Truck', 'Excavator']
+SAMPLE_CHUNK_ROWS = 1000000
+
+def _column_rngs(seed, columns):
+    """Return one Generator per column, so output does not depend on chunk size"""
+    children = np.random.SeedSequence(seed).spawn(len(columns))
+    return {column: np.random.default_rng(child) for column, child in zip(columns, children)}
+
+def _date_chunks(dates, rows_per_date, chunk_rows):
+    """Split a date range into slices of roughly chunk_rows generated rows"""
+    dates_per_chunk = max((chunk_rows or len(dates) * rows_per_date) // rows_per_date, 1)
+    for i in range(0, len(dates), dates_per_chunk):
+        yield dates[i:i + dates_per_chunk]
+
+def iter_sample_stope_data(n_stopes=5, start='2024-01-01', end='2024-06-01', freq='D',
+                           seed=42, chunk_rows=SAMPLE_CHUNK_ROWS):
+    """Generate sample stope width data in chunks of about chunk_rows rows"""
+    dates = pd.date_range(start=start, end=end, freq=freq)
+    stope_ids = [f'STOPE_{stope_id:02d}' for stope_id in range(1, n_stopes + 1)]
+    rngs = _column_rngs(seed, ['stope_width', 'rock_density', 'depth', 'zone'])
+
+    for chunk_dates in _date_chunks(dates, n_stopes, chunk_rows):
+        n = len(chunk_dates) * n_stopes
+        yield pd.DataFrame({
+            'date': np.repeat(chunk_dates.values, n_stopes),
+            'stope_id': pd.Categorical.from_codes(np.tile(np.arange(n_stopes), len(chunk_dates)), stope_ids),
+            'stope_width': rngs['stope_width'].normal(15, 3, n),
+            'rock_density': rngs['rock_density'].normal(2.8, 0.2, n),
+            'depth': rngs['depth'].normal(500, 100, n),
+            'zone': pd.Categorical.from_codes(rngs['zone'].integers(0, len(ZONES), n), ZONES)
+        })
+
+def iter_sample_blast_data(n_blasts=3, start='2024-01-01', end='2024-06-01', freq='D',
+                           seed=42, chunk_rows=SAMPLE_CHUNK_ROWS):
+    """Generate sample blast sequencing data in chunks of about chunk_rows rows"""
+    dates = pd.date_range(start=start, end=end, freq=freq)
+    blast_ids = [f'BLAST_{blast_id:02d}' for blast_id in range(1, n_blasts + 1)]
+    rngs = _column_rngs(seed, ['explosives_used', 'fragmentation_size', 'vibration_level', 'sequence_number'])
+
+    for chunk_dates in _date_chunks(dates, n_blasts, chunk_rows):
+        n = len(chunk_dates) * n_blasts
+        yield pd.DataFrame({
+            'date': np.repeat(chunk_dates.values, n_blasts),
+            'blast_id': pd.Categorical.from_codes(np.tile(np.arange(n_blasts), len(chunk_dates)), blast_ids),
+            'explosives_used': rngs['explosives_used'].normal(500, 100, n),
+            'fragmentation_size': rngs['fragmentation_size'].normal(0.5, 0.1, n),
+            'vibration_level': rngs['vibration_level'].normal(8, 2, n),
+            'sequence_number': rngs['sequence_number'].integers(1, 10, n)
+        })
+
+def iter_sample_equipment_data(units_per_type=3, equipment_types=None, start='2024-01-01',
+                               end='2024-06-28', freq='D', seed=42, chunk_rows=SAMPLE_CHUNK_ROWS):
+    """Generate sample equipment utilization data in chunks of about chunk_rows rows"""
+    equipment_types = equipment_types or EQUIPMENT_TYPES
+    dates = pd.date_range(start=start, end=end, freq=freq)
+    equipment_ids = [f'{eq_type}_{eq_id:02d}' for eq_type in equipment_types
+                     for eq_id in range(1, units_per_type + 1)]
+    type_codes = np.repeat(np.arange(len(equipment_types)), units_per_type)
+    n_units = len(equipment_ids)
+    rngs = _column_rngs(seed, ['hours_operated', 'maintenance_hours', 'downtime_hours', 'fuel_consumption'])
+
+    for chunk_dates in _date_chunks(dates, n_units, chunk_rows):
+        n = len(chunk_dates) * n_units
+        hours_operated = rngs['hours_operated'].normal(16, 4, n)
+        yield pd.DataFrame({
+            'date': np.repeat(chunk_dates.values, n_units),
+            'equipment_id': pd.Categorical.from_codes(np.tile(np.arange(n_units), len(chunk_dates)), equipment_ids),
+            'equipment_type': pd.Categorical.from_codes(np.tile(type_codes, len(chunk_dates)), equipment_types),
+            'hours_operated': hours_operated,
+            'maintenance_hours': rngs['maintenance_hours'].normal(2, 0.5, n),
+            'downtime_hours': rngs['downtime_hours'].normal(1, 0.3, n),
+            'fuel_consumption': rngs['fuel_consumption'].normal(50, 10, n),
+            'utilization_rate': (hours_operated / 24) * 100
+        })
+
+def generate_sample_stope_data(**params):
     """Generate sample stope width data"""
-    np.random.seed(42)
-    dates = pd.date_range(start='2024-01-01', end='2024-06-01', freq='D')
-    
-    data = []
-    for date in dates:
-        for stope_id in range(1, 6):
-            data.append({
-                'date': date,
-                'stope_id': f'STOPE_{stope_id:02d}',
-                'stope_width': np.random.normal(15, 3),
-                'rock_density': np.random.normal(2.8, 0.2),
-                'depth': np.random.normal(500, 100),
-                'zone': np.random.choice(['North', 'South', 'East', 'West'])
-            })
-    
-    return pd.DataFrame(data)
+    return pd.concat(iter_sample_stope_data(chunk_rows=None, **params), ignore_index=True)
 
-def generate_sample_blast_data():
+def generate_sample_blast_data(**params):
     """Generate sample blast sequencing data"""
-    np.random.seed(42)
-    dates = pd.date_range(start='2024-01-01', end='2024-06-01', freq='D')
-    
-    data = []
-    for date in dates:
-        for blast_id in range(1, 4):
-            data.append({
-                'date': date,
-                'blast_id': f'BLAST_{blast_id:02d}',
-                'explosives_used': np.random.normal(500, 100),
-                'fragmentation_size': np.random.normal(0.5, 0.1),
-                'vibration_level': np.random.normal(8, 2),
-                'sequence_number': np.random.randint(1, 10)
-            })
-    
-    return pd.DataFrame(data)
+    return pd.concat(iter_sample_blast_data(chunk_rows=None, **params), ignore_index=True)
 
-def generate_sample_equipment_data():
+def generate_sample_equipment_data(**params):
     """Generate sample equipment utilization data"""
-    np.random.seed(42)
-    equipment_types = ['Drill Rig', 'LHD', 'Truck', 'Excavator']
-    
-    data = []
-    for day in range(180):  # 6 months
-        date = datetime(2024, 1, 1) + timedelta(days=day)
-        for eq_type in equipment_types:
-            for eq_id in range(1, 4):
-                data.append({
-                    'date': date,
-                    'equipment_id': f'{eq_type}_{eq_id:02d}',
-                    'equipment_type': eq_type,
-                    'hours_operated': np.random.normal(16, 4),
-                    'maintenance_hours': np.random.normal(2, 0.5),
-                    'downtime_hours': np.random.normal(1, 0.3),
-                    'fuel_consumption': np.random.normal(50, 10)
-                })
-    
-    df = pd.DataFrame(data)
-    df['utilization_rate'] = (df['hours_operated'] / 24) * 100
-    return df
+    return pd.concat(iter_sample_equipment_data(chunk_rows=None, **params), ignore_index=True)
+
+_SAMPLE_ITERATORS = {
+    'stope': iter_sample_stope_data,
+    'blast': iter_sample_blast_data,
+    'equipment': iter_sample_equipment_data,
+}
+
+def write_sample_csv(name, path, chunk_rows=SAMPLE_CHUNK_ROWS, **params):
+    """Stream a generated dataset to a CSV file chunk by chunk
+
+    Only one chunk is held in memory at a time, so arbitrarily large
+    datasets can be produced for load testing. Returns the rows written.
+    """
+    rows = 0
+    with open(path, 'w', newline='') as handle:
+        for chunk in _SAMPLE_ITERATORS[name](chunk_rows=chunk_rows, **params):
+            chunk.to_csv(handle, index=False, header=rows == 0, date_format='%Y-%m-%dT%H:%M:%S.%f')
+            rows += len(chunk)
+    return rows
+
+def write_sample_data(data_dir, n_stopes=5, n_blasts=3, units_per_type=3, start='2024-01-01',
+                      end='2024-06-01', freq='D', seed=42, chunk_rows=SAMPLE_CHUNK_ROWS):
+    """Write stope, blast and equipment CSVs of a chosen scale into data_dir
+
+    Rows per dataset are (number of timestamps between start and end at
+    freq) times n_stopes, n_blasts or units_per_type * 4 respectively.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    date_span = {'start': start, 'end': end, 'freq': freq, 'seed': seed}
+    return {
+        'stope': write_sample_csv('stope', os.path.join(data_dir, 'stope_data.csv'),
+                                  chunk_rows, n_stopes=n_stopes, **date_span),
+        'blast': write_sample_csv('blast', os.path.join(data_dir, 'blast_data.csv'),
+                                  chunk_rows, n_blasts=n_blasts, **date_span),
+        'equipment': write_sample_csv('equipment', os.path.join(data_dir, 'equipment_data.csv'),
+                                      chunk_rows, units_per_type=units_per_type, **date_span),
+    }
 
 def load_sample_data():
     """Load all sample datasets"""
@@ -80,108 +172,744 @@ def get_mine_context():
         'typical_operations': ['El Teniente (Chile)', 'Kidd Creek (Canada)']
     }
 
-def load_real_data():
-    """Load data from CSV files if available, otherwise use sample data"""
-    import os
-    import glob
-    
-    # Check for CSV files
-    csv_files = glob.glob('data/*.csv')
-    print(f"Found CSV files: {csv_files}")
-    
-    stope_data = None
-    blast_data = None
-    equipment_data = None
-    
-    # Load stope data
-    for csv_file in csv_files:
+def find_dataset_file(name, data_dir=DATA_DIR):
+    """Return the first CSV in data_dir whose filename mentions the dataset name"""
+    for csv_file in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        if name in os.path.basename(csv_file).lower():
+            return csv_file
+    return None
+
+def file_fingerprint(path):
+    """Return a (path, size, mtime) fingerprint for a source file, or None"""
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+def find_sites(data_dir=DATA_DIR):
+    """Return the names of the per-site subdirectories of data_dir that hold CSVs
+
+    A data directory laid out as data/<site>/*.csv is loaded in multi-site
+    mode, with every row tagged by its site.
+    """
+    if not os.path.isdir(data_dir):
+        return []
+    return [
+        entry for entry in sorted(os.listdir(data_dir))
+        if not entry.startswith('.') and entry != SIDECAR_DIR
+        and glob.glob(os.path.join(data_dir, entry, '*.csv'))
+    ]
+
+def dataset_fingerprint(name, data_dir=DATA_DIR):
+    """Return the fingerprint of a dataset's sources, or None if it has none
+
+    In multi-site mode this is a tuple of (site, fingerprint) pairs.
+    """
+    sites = find_sites(data_dir)
+    if not sites:
+        return file_fingerprint(find_dataset_file(name, data_dir))
+    fingerprints = tuple(
+        (site, file_fingerprint(find_dataset_file(name, os.path.join(data_dir, site))))
+        for site in sites
+    )
+    return fingerprints if any(fingerprint for _, fingerprint in fingerprints) else None
+
+def get_data_fingerprint(data_dir=DATA_DIR):
+    """Return the fingerprint of every dataset source in data_dir"""
+    return tuple((name, dataset_fingerprint(name, data_dir)) for name in DATASETS)
+
+# Column types used for the columnar sidecars: ids and labels become
+# categoricals, measurements float32 and dates datetime64.
+DATASET_SCHEMAS = {
+    'stope': {
+        'dates': ['date'],
+        'categories': ['stope_id', 'zone', 'site'],
+        'measures': ['stope_width', 'rock_density', 'depth'],
+        'integers': [],
+    },
+    'blast': {
+        'dates': ['date'],
+        'categories': ['blast_id', 'site'],
+        'measures': ['explosives_used', 'fragmentation_size', 'vibration_level'],
+        'integers': ['sequence_number'],
+    },
+    'equipment': {
+        'dates': ['date'],
+        'categories': ['equipment_id', 'equipment_type', 'site'],
+        'measures': ['utilization_rate', 'hours_operated', 'maintenance_hours',
+                     'downtime_hours', 'fuel_consumption'],
+        'integers': [],
+    },
+}
+
+SIDECAR_DIR = '.cache'
+# Sidecars are uncompressed Arrow IPC files so they can be memory-mapped
+SIDECAR_SUFFIX = '.arrow'
+# Frame attributes stored with a sidecar and restored when it is opened
+PERSISTED_ATTRS = ('undated', 'sorted_by')
+
+# Memory budget for parsing one CSV; chunk sizes are derived from it
+MEMORY_BUDGET_MB = int(os.environ.get('DASHBOARD_MEMORY_BUDGET_MB', '1024'))
+# Fixed rows per chunk, or None to derive it from the memory budget
+CHUNK_ROWS = None
+MIN_CHUNK_ROWS = 1000
+# Rough ratio of parser working memory to raw CSV bytes
+PARSE_OVERHEAD = 10
+
+_load_reports = {}
+
+def apply_schema(df, name):
+    """Cast the columns of a dataset frame to its declared column types"""
+    schema = DATASET_SCHEMAS[name]
+    for column in schema['dates']:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    for column in schema['categories']:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in schema['measures']:
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+    for column in schema['integers']:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+def _sidecar_path(csv_file, fingerprint):
+    """Return the columnar sidecar path for the version of a CSV with the given fingerprint"""
+    _, size, mtime_ns = fingerprint
+    stem = os.path.splitext(os.path.basename(csv_file))[0]
+    cache_dir = os.path.join(os.path.dirname(csv_file), SIDECAR_DIR)
+    return os.path.join(cache_dir, f"{stem}-{size}-{mtime_ns}{SIDECAR_SUFFIX}")
+
+def _remove_stale_sidecars(sidecar, prefix):
+    """Remove older sidecars sharing a prefix, including compressed .feather ones"""
+    for suffix in (SIDECAR_SUFFIX, '.feather'):
+        for path in glob.glob(os.path.join(os.path.dirname(sidecar), f"{prefix}-*{suffix}")):
+            if path == sidecar:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                # Mapped files cannot be removed on some platforms while in use
+                print(f"Could not remove stale columnar cache {path}: {e}")
+
+def write_arrow(data, path):
+    """Write a frame to an uncompressed Arrow file that open_arrow can memory-map"""
+    table = pa.Table.from_pandas(data.reset_index(drop=True), preserve_index=False)
+    attrs = {key: data.attrs[key] for key in PERSISTED_ATTRS if key in data.attrs}
+    table = table.replace_schema_metadata({**table.schema.metadata, b'dashboard_attrs': json.dumps(attrs).encode()})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so readers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # A single record batch: columns split over batches are copied when converted to pandas
+    feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, path)
+
+def open_arrow(path):
+    """Open an Arrow file memory-mapped as a zero-copy, read-only frame
+
+    Numeric and date columns are views on the mapped file rather than
+    copies, so every session and process that opens the same file shares
+    one copy of it in the OS page cache.
+    """
+    table = feather.read_table(path, memory_map=True)
+    data = table.to_pandas(split_blocks=True)
+    metadata = table.schema.metadata or {}
+    data.attrs.update(json.loads(metadata.get(b'dashboard_attrs', b'{}')))
+    return data
+
+def csv_dtypes(name):
+    """Return the read_csv dtype mapping declared for a dataset"""
+    schema = DATASET_SCHEMAS[name]
+    dtypes = {column: 'category' for column in schema['categories']}
+    dtypes.update({column: 'float32' for column in schema['measures']})
+    return dtypes
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def _chunk_rows_for_budget(sample, memory_budget_mb):
+    """Derive rows per chunk from the average line length of a sample of the file"""
+    row_bytes = max(len(sample) // max(sample.count(b'\n'), 1), 1)
+    # Keep a quarter of the budget for the chunk being parsed; the rest
+    # holds the typed chunks accumulated so far
+    chunk_bytes = memory_budget_mb * 1024 * 1024 // 4
+    return max(chunk_bytes // (row_bytes * PARSE_OVERHEAD), MIN_CHUNK_ROWS)
+
+def read_csv_chunked(name, source, chunk_rows=None, memory_budget_mb=None, size=None):
+    """Stream a dataset CSV in chunks, typing each chunk before it is kept
+
+    Each chunk is parsed with the dataset's declared dtypes (categorical
+    ids, float32 measures), the CSV index column is never materialized and
+    dates are converted before the next chunk is read, so peak memory stays
+    close to the size of the typed result. `source` is a path or a binary
+    buffer; with a `size`, only the first `size` bytes of a path are parsed,
+    so rows appended after the file was sized are left for the next append.
+    Returns the frame and a report of bytes read, throughput and peak
+    memory.
+    """
+    memory_budget_mb = memory_budget_mb or MEMORY_BUDGET_MB
+    prefix = None
+    if isinstance(source, (str, os.PathLike)):
+        bytes_read = os.path.getsize(source) if size is None else size
+        with open(source, 'rb') as handle:
+            sample = handle.read(min(64 * 1024, bytes_read))
+        if size is not None:
+            source = prefix = open_prefix(source, size)
+    else:
+        bytes_read = len(source.getbuffer())
+        sample = bytes(source.getbuffer()[:64 * 1024])
+    chunk_rows = chunk_rows or CHUNK_ROWS or _chunk_rows_for_budget(sample, memory_budget_mb)
+
+    start = time.perf_counter()
+    chunks = []
+    typed_bytes = 0
+    over_budget = False
+    try:
+        reader = pd.read_csv(source, chunksize=chunk_rows, dtype=csv_dtypes(name),
+                             usecols=lambda column: not column.startswith('Unnamed: '))
+        for chunk in reader:
+            chunk = apply_schema(chunk, name)
+            typed_bytes += chunk.memory_usage(deep=True).sum()
+            chunks.append(chunk)
+            if typed_bytes > memory_budget_mb * 1024 * 1024 and not over_budget:
+                over_budget = True
+                print(f"Warning: typed {name} data exceeds the {memory_budget_mb}MB memory budget")
+    finally:
+        if prefix is not None:
+            prefix.close()
+
+    data = concat_frames(chunks) if chunks else pd.DataFrame(columns=list(csv_dtypes(name)))
+    seconds = time.perf_counter() - start
+    report = {
+        'rows': len(data),
+        'chunks': len(chunks),
+        'chunk_rows': chunk_rows,
+        'bytes_read': bytes_read,
+        'seconds': seconds,
+        'rows_per_second': len(data) / seconds if seconds else None,
+        'mb_per_second': bytes_read / 1024 / 1024 / seconds if seconds else None,
+        'frame_mb': data.memory_usage(deep=True).sum() / 1024 / 1024,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+    return data, report
+
+def get_load_reports():
+    """Return the most recent CSV load report of each dataset"""
+    return dict(_load_reports)
+
+def _parse_csv(name, csv_file, size=None):
+    """Parse a dataset CSV, or its first `size` bytes, and cast it to the dataset schema"""
+    print(f"Loading {name} data: {csv_file}")
+    data, report = read_csv_chunked(name, csv_file, size=size)
+    _load_reports[name] = report
+    print(f"Successfully loaded {name} data with shape: {data.shape}")
+    print(f"Read {report['bytes_read'] / 1024 / 1024:.1f}MB in {report['chunks']} chunks "
+          f"at {report['rows_per_second'] or 0:,.0f} rows/s, peak RSS {report['peak_rss_mb'] or 0:.0f}MB")
+
+    return sort_by_date(data)
+
+def read_columnar(name, csv_file, fingerprint=None):
+    """Read a dataset CSV through its typed columnar sidecar
+
+    The sidecar is written the first time a CSV version is parsed and is
+    named after the CSV's size and mtime, so any change to the CSV makes
+    the next load parse it again and replace the sidecar. The frame is
+    always returned memory-mapped from the sidecar (see open_arrow), also
+    right after parsing, so the parsed copy does not stay in memory.
+
+    The CSV is read as of `fingerprint` (see file_fingerprint), or of a
+    single stat taken here: only the bytes it counted are parsed, so the
+    frame, its sidecar and the caller's ingest offset all describe the
+    same version even while the file is being appended to.
+    """
+    fingerprint = fingerprint or file_fingerprint(csv_file)
+    if feather is None:
+        return _parse_csv(name, csv_file, fingerprint[1])
+
+    sidecar = _sidecar_path(csv_file, fingerprint)
+    if os.path.exists(sidecar):
         try:
-            if 'stope' in csv_file.lower():
-                print(f"Loading stope data: {csv_file}")
-                stope_data = pd.read_csv(csv_file)
-                print(f"Successfully loaded stope data with shape: {stope_data.shape}")
-                
-                # Clean up the data
-                if 'Unnamed: 0' in stope_data.columns:
-                    stope_data = stope_data.drop(columns=['Unnamed: 0'])
-                    print("Removed index column 'Unnamed: 0' from stope data")
-                
-                if 'date' in stope_data.columns:
-                    stope_data['date'] = pd.to_datetime(stope_data['date'])
-                    print("Converted stope date column to datetime")
-                
-                print(f"Cleaned stope data shape: {stope_data.shape}")
-                break
-                    
+            data = open_arrow(sidecar)
+            print(f"Loaded {name} data from columnar cache: {sidecar}")
+            return data
         except Exception as e:
-            print(f"Error loading stope data {csv_file}: {e}")
-    
-    # Load equipment data
-    for csv_file in csv_files:
+            print(f"Error reading columnar cache {sidecar}: {e}")
+
+    data = _parse_csv(name, csv_file, fingerprint[1])
+    try:
+        write_arrow(data, sidecar)
+        _remove_stale_sidecars(sidecar, os.path.splitext(os.path.basename(csv_file))[0])
+        print(f"Wrote columnar cache: {sidecar}")
+        return open_arrow(sidecar)
+    except Exception as e:
+        print(f"Error writing columnar cache {sidecar}: {e}")
+    return data
+
+def _clean_stope_data(stope_data):
+    """Finish cleaning typed stope data"""
+    print(f"Cleaned stope data shape: {stope_data.shape}")
+    return stope_data
+
+def _clean_equipment_data(equipment_data):
+    """Finish cleaning typed equipment data"""
+    # If no date column exists (summary data), create a dummy date for compatibility
+    if 'date' not in equipment_data.columns:
+        equipment_data['date'] = pd.to_datetime('2024-01-01')  # Use a fixed date
+        equipment_data.attrs['undated'] = True
+        print("Added dummy date column for equipment summary data")
+
+    # Ensure utilization_rate exists, calculate if needed
+    if 'utilization_rate' not in equipment_data.columns and 'hours_operated' in equipment_data.columns:
+        equipment_data['utilization_rate'] = (equipment_data['hours_operated'] / 24) * 100
+        print("Calculated utilization_rate from hours_operated")
+
+    print(f"Cleaned equipment data shape: {equipment_data.shape}")
+    return equipment_data
+
+def _clean_blast_data(blast_data):
+    """Finish cleaning typed blast data"""
+    return blast_data
+
+_CLEANERS = {
+    'stope': _clean_stope_data,
+    'blast': _clean_blast_data,
+    'equipment': _clean_equipment_data,
+}
+
+_GENERATORS = {
+    'stope': generate_sample_stope_data,
+    'blast': generate_sample_blast_data,
+    'equipment': generate_sample_equipment_data,
+}
+
+def _read_dataset(name, csv_file, fingerprint=None):
+    """Read one dataset from its CSV as of `fingerprint`, falling back to sample data
+
+    Returns the frame and whether it came from csv_file.
+    """
+    data = None
+    if csv_file is not None:
         try:
-            if 'equipment' in csv_file.lower():
-                print(f"Loading equipment data: {csv_file}")
-                equipment_data = pd.read_csv(csv_file)
-                print(f"Successfully loaded equipment data with shape: {equipment_data.shape}")
-                
-                # Clean up the data
-                if 'Unnamed: 0' in equipment_data.columns:
-                    equipment_data = equipment_data.drop(columns=['Unnamed: 0'])
-                    print("Removed index column 'Unnamed: 0' from equipment data")
-                
-                # If no date column exists (summary data), create a dummy date for compatibility
-                if 'date' not in equipment_data.columns:
-                    equipment_data['date'] = pd.to_datetime('2024-01-01')  # Use a fixed date
-                    print("Added dummy date column for equipment summary data")
-                else:
-                    equipment_data['date'] = pd.to_datetime(equipment_data['date'])
-                    
-                # Ensure utilization_rate exists, calculate if needed
-                if 'utilization_rate' not in equipment_data.columns and 'hours_operated' in equipment_data.columns:
-                    equipment_data['utilization_rate'] = (equipment_data['hours_operated'] / 24) * 100
-                    print("Calculated utilization_rate from hours_operated")
-                    
-                print(f"Cleaned equipment data shape: {equipment_data.shape}")
-                break
-                
+            data = _CLEANERS[name](read_columnar(name, csv_file, fingerprint))
         except Exception as e:
-            print(f"Error loading equipment data {csv_file}: {e}")
-    
-    # Load blast data (use sample if no CSV)
-    blast_data_loaded = False
-    for csv_file in csv_files:
+            print(f"Error loading {name} data {csv_file}: {e}")
+
+    if data is None:
+        print(f"No {name} data CSV found, using sample data")
+        return sort_by_date(apply_schema(_GENERATORS[name](), name)), False
+
+    print(f"Using real {name} data with {len(data)} rows")
+    return sort_by_date(data), True
+
+# Per-site files are parsed in worker processes; 0 means one per CPU core
+SITE_WORKERS = int(os.environ.get('DASHBOARD_SITE_WORKERS', '0')) or os.cpu_count() or 1
+_site_pool = None
+_site_pool_lock = threading.Lock()
+
+def _get_site_pool():
+    global _site_pool
+    with _site_pool_lock:
+        if _site_pool is None:
+            # Spawned rather than forked workers: the app server is multi-threaded
+            _site_pool = ProcessPoolExecutor(max_workers=SITE_WORKERS,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return _site_pool
+
+def _reset_site_pool(pool):
+    """Drop a pool whose worker died, so the next load starts a new one"""
+    global _site_pool
+    with _site_pool_lock:
+        if _site_pool is pool:
+            _site_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _read_site_file(name, csv_file):
+    """Parse and clean one site's dataset CSV; runs in a worker process"""
+    return _CLEANERS[name](read_columnar(name, csv_file))
+
+def _tag_site(data, site):
+    data['site'] = pd.Categorical.from_codes(np.zeros(len(data), dtype='int8'), [site])
+    return data
+
+def _snapshot_path(name, data_dir, fingerprint):
+    """Return the path of the combined multi-site sidecar for a dataset version"""
+    digest = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:16]
+    return os.path.join(data_dir, SIDECAR_DIR, f"{name}-sites-{digest}{SIDECAR_SUFFIX}")
+
+def _read_sites(name, data_dir, sites, fingerprint=None):
+    """Read a dataset from every site directory in parallel and tag rows by site
+
+    Sites without a CSV for the dataset are skipped; when no site has one
+    the sample data is used. Given the dataset's fingerprint, the combined
+    frame is kept as a memory-mapped sidecar in data_dir, so other
+    processes open it without touching the site files. Returns the frame
+    and whether it came from CSV. Sites may have different columns; summary
+    sites without dates are skipped when other sites have dated rows. The
+    sidecar is only written when every site's file loaded, so a failed site
+    is read again on the next load.
+    """
+    snapshot = _snapshot_path(name, data_dir, fingerprint) if feather is not None and fingerprint else None
+    if snapshot is not None and os.path.exists(snapshot):
         try:
-            if 'blast' in csv_file.lower():
-                print(f"Loading blast data: {csv_file}")
-                blast_data = pd.read_csv(csv_file)
-                print(f"Successfully loaded blast data with shape: {blast_data.shape}")
-                
-                if 'date' in blast_data.columns:
-                    blast_data['date'] = pd.to_datetime(blast_data['date'])
-                    print("Converted blast date column to datetime")
-                
-                blast_data_loaded = True
-                break
+            data = open_arrow(snapshot)
+            print(f"Loaded {name} data from columnar cache: {snapshot}")
+            return data, True
         except Exception as e:
-            print(f"Error loading blast data {csv_file}: {e}")
-    
-    # Fill in missing data with sample data
-    if stope_data is None:
-        print("No stope data CSV found, using sample data")
-        stope_data = generate_sample_stope_data()
+            print(f"Error reading columnar cache {snapshot}: {e}")
+
+    csv_files = [(site, find_dataset_file(name, os.path.join(data_dir, site))) for site in sites]
+    csv_files = [(site, csv_file) for site, csv_file in csv_files if csv_file is not None]
+    if not csv_files:
+        data, _ = _read_dataset(name, None)
+        return data, False
+
+    if SITE_WORKERS > 1 and len(csv_files) > 1:
+        pool = _get_site_pool()
+        futures = [(site, csv_file, pool.submit(_read_site_file, name, csv_file)) for site, csv_file in csv_files]
+        results = []
+        for site, csv_file, future in futures:
+            try:
+                results.append(_tag_site(future.result(), site))
+            except BrokenProcessPool as e:
+                print(f"Error loading {name} data {csv_file}: {e}")
+                _reset_site_pool(pool)
+            except Exception as e:
+                print(f"Error loading {name} data {csv_file}: {e}")
     else:
-        print(f"Using real stope data with {len(stope_data)} rows")
-    
-    if blast_data is None or not blast_data_loaded:
-        print("No blast data CSV found, using sample data")
-        blast_data = generate_sample_blast_data()
+        results = []
+        for site, csv_file in csv_files:
+            try:
+                results.append(_tag_site(_read_site_file(name, csv_file), site))
+            except Exception as e:
+                print(f"Error loading {name} data {csv_file}: {e}")
+
+    # Placeholder dates of summary data would be charted as real days next
+    # to dated sites, so a mix keeps only the dated sites
+    undated = [frame['site'].iloc[0] for frame in results if frame.attrs.get('undated') and len(frame)]
+    if undated and len(undated) < len(results):
+        print(f"Skipping {name} data without dates from sites {', '.join(undated)}")
+        results = [frame for frame in results if not frame.attrs.get('undated')]
+
+    if not results:
+        data, _ = _read_dataset(name, None)
+        return data, False
+    data = sort_by_date(concat_frames(results))
+    print(f"Using real {name} data from {len(results)} sites with {len(data)} rows")
+    if snapshot is not None and len(results) == len(csv_files):
+        try:
+            write_arrow(data, snapshot)
+            _remove_stale_sidecars(snapshot, f"{name}-sites")
+            data = open_arrow(snapshot)
+        except Exception as e:
+            print(f"Error writing columnar cache {snapshot}: {e}")
+    return data, True
+
+def read_dataset(name, data_dir=DATA_DIR):
+    """Read one dataset from disk without caching it
+
+    Returns the frame and its version, the source fingerprint or 'sample'
+    when no CSV was found.
+    """
+    fingerprint = dataset_fingerprint(name, data_dir)
+    sites = find_sites(data_dir)
+    if sites:
+        data, _ = _read_sites(name, data_dir, sites, fingerprint)
     else:
-        print(f"Using real blast data with {len(blast_data)} rows")
-    
-    if equipment_data is None:
-        print("No equipment data CSV found, using sample data")
-        equipment_data = generate_sample_equipment_data()
+        data, _ = _read_dataset(name, find_dataset_file(name, data_dir), fingerprint)
+    return data, fingerprint if fingerprint is not None else 'sample'
+
+def _missing_column(like, rows):
+    """Return an all-missing column of `rows` values typed like `like`"""
+    dtype = like.dtype
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        dtype = 'float64'
+    return pd.Series(index=pd.RangeIndex(rows), dtype=dtype)
+
+def concat_frames(frames):
+    """Concatenate dataset frames, keeping categorical columns categorical
+
+    Frames may have different columns: the result has every column of any
+    frame, missing in the rows of frames without it. Attributes are kept
+    only where every frame agrees on them.
+    """
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    names = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    columns = {}
+    for column in names:
+        like = next(frame[column] for frame in frames if column in frame.columns)
+        values = [frame[column] if column in frame.columns else _missing_column(like, len(frame))
+                  for frame in frames]
+        categorical = [isinstance(v.dtype, pd.CategoricalDtype) for v in values]
+        if all(categorical):
+            columns[column] = pd.Series(union_categoricals(values, ignore_order=True))
+        else:
+            combined = pd.concat([v.reset_index(drop=True) for v in values], ignore_index=True)
+            columns[column] = combined.astype('category') if any(categorical) else combined
+    data = pd.DataFrame(columns)
+    # The version and append marker describe the first frame, not the combined one
+    data.attrs = {
+        key: value for key, value in frames[0].attrs.items()
+        if key not in ('version', 'appended') and all(frame.attrs.get(key) == value for frame in frames[1:])
+    }
+    return data
+
+def _append_dataset(name, data, state):
+    """Parse rows appended to a dataset's CSV and add them to the loaded frame
+
+    Returns (data, state) for the extended dataset, or None when the
+    source was truncated or rewritten and needs a full reload.
+    """
+    appended = read_appended(state)
+    if appended is None:
+        return None
+    header, new_bytes, new_state = appended
+    if not new_bytes.strip():
+        return data, new_state
+
+    new_rows, _ = read_csv_chunked(name, io.BytesIO(header + new_bytes))
+    new_rows = _CLEANERS[name](new_rows)
+    if list(new_rows.columns) != list(data.columns):
+        print(f"Appended {name} rows have different columns, full reload needed")
+        return None
+    new_state.rows += len(new_rows)
+    print(f"Appended {len(new_rows)} new {name} rows from {state.path}")
+
+    base_rows = len(data)
+    in_order = 'date' not in data.columns or data.empty or (
+        new_rows['date'].is_monotonic_increasing and new_rows['date'].min() >= data['date'].iloc[-1])
+    combined = concat_frames([data, new_rows])
+    if in_order:
+        # Existing rows keep their positions, so derived aggregates can be
+        # extended with just the new tail instead of being rebuilt
+        if 'sorted_by' in data.attrs:
+            combined.attrs['sorted_by'] = data.attrs['sorted_by']
+        combined.attrs['appended'] = {'base_version': data.attrs.get('version'), 'base_rows': base_rows}
     else:
-        print(f"Using real equipment data with {len(equipment_data)} rows")
-    
+        # Re-sorting moves existing rows, so derived aggregates must be rebuilt
+        combined.attrs.pop('appended', None)
+        combined.attrs.pop('sorted_by', None)
+        combined = sort_by_date(combined)
+    return combined, new_state
+
+def sort_by_date(df, column='date'):
+    """Return df ordered by its date column and mark it as date-sorted"""
+    if column not in df.columns:
+        return df
+    if not df[column].is_monotonic_increasing:
+        df = df.sort_values(column, kind='stable').reset_index(drop=True)
+    df.attrs['sorted_by'] = column
+    return df
+
+def filter_by_date(df, start_date=None, end_date=None, column='date'):
+    """Return the rows of df dated from start_date to end_date inclusive
+
+    Date-sorted frames (see sort_by_date) are sliced with a binary search on
+    the date column, so the cost follows the size of the selected range
+    rather than the whole history. Frames whose dates are only placeholders
+    (equipment summary data) are returned unfiltered.
+    """
+    if df.empty or column not in df.columns or df.attrs.get('undated'):
+        return df
+    if start_date is None and end_date is None:
+        return df
+
+    if df.attrs.get('sorted_by') != column:
+        # end_date is inclusive of the whole day
+        mask = pd.Series(True, index=df.index)
+        if start_date is not None:
+            mask &= df[column] >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= df[column] < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        return df[mask]
+
+    lo, hi = date_bounds(df[column].to_numpy(), start_date, end_date)
+    return df.iloc[lo:hi]
+
+def filter_by_site(df, sites=None):
+    """Return the rows of df from the given sites; None keeps every site"""
+    if sites is None or 'site' not in df.columns:
+        return df
+    df = df[df['site'].isin(sites)]
+    # Ids of the other sites would otherwise linger as empty categories in charts
+    categorical = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+    return df.assign(**{column: df[column].cat.remove_unused_categories() for column in categorical})
+
+# Loaded frames are shared by every session in the process, keyed on
+# (dataset, data_dir) and tagged with the source fingerprint they came from.
+_dataset_cache = {}
+_dataset_locks = {}
+_cache_lock = threading.Lock()
+
+def _dataset_lock(key):
+    with _cache_lock:
+        return _dataset_locks.setdefault(key, threading.Lock())
+
+def _load_version(name, data_dir, cached, fingerprint, incremental, attrs):
+    """Read the version of a dataset with the given fingerprint, appending to `cached` when possible
+
+    Returns the frame, tagged with its version, and the ingest state for
+    the next incremental append.
+    """
+    sites = find_sites(data_dir)
+    csv_file = None if sites else find_dataset_file(name, data_dir)
+    result = None
+    if incremental and cached is not None and cached[2] is not None and cached[2].path == csv_file:
+        try:
+            result = _append_dataset(name, cached[1], cached[2])
+        except Exception as e:
+            print(f"Error appending {name} data {csv_file}: {e}")
+    if result is not None:
+        data, state = result
+        attrs['source'] = 'append'
+    elif sites:
+        data, from_csv = _read_sites(name, data_dir, sites, fingerprint)
+        state = None
+        attrs['source'] = 'sites' if from_csv else 'sample'
+        attrs['sites'] = len(sites)
+    else:
+        # The ingest offset is the size the file was parsed up to, not its current size
+        data, from_csv = _read_dataset(name, csv_file, fingerprint)
+        state = capture_state(csv_file, fingerprint[1], len(data)) if from_csv else None
+        attrs['source'] = 'csv' if from_csv else 'sample'
+
+    # Derived structures (rollups) key their caches on this version
+    data.attrs['version'] = fingerprint if fingerprint is not None else 'sample'
+    attrs['rows'] = len(data)
+    return data, state
+
+def load_dataset(name, data_dir=DATA_DIR, incremental=True, refresh=True):
+    """Load one dataset, reusing the cached frame while its source file is unchanged
+
+    With `incremental`, a source that has only grown since it was last
+    loaded has just its new rows parsed and appended to the cached frame;
+    truncated or rewritten sources are reloaded in full. In multi-site mode
+    (see find_sites) the site files are parsed in parallel worker processes
+    and any change reloads the dataset in full. With refresh=False a loaded
+    version is returned without checking the source, for when a background
+    refresh (see refresh_dataset) swaps in new versions. The returned frame
+    is shared across sessions and must be treated as read-only.
+    """
+    key = (name, os.path.abspath(data_dir))
+    if not refresh:
+        cached = _dataset_cache.get(key)
+        if cached is not None:
+            return cached[1]
+    with _dataset_lock(key), span('load_dataset', dataset=name) as attrs:
+        fingerprint = dataset_fingerprint(name, data_dir)
+        cached = _dataset_cache.get(key)
+        if cached is not None and (cached[0] == fingerprint or not refresh):
+            attrs['source'] = 'cache'
+            attrs['rows'] = len(cached[1])
+            return cached[1]
+
+        data, state = _load_version(name, data_dir, cached, fingerprint, incremental, attrs)
+        _dataset_cache[key] = (fingerprint, data, state)
+        return data
+
+def refresh_dataset(name, data_dir=DATA_DIR, prepare=None):
+    """Load a dataset whose source changed and swap the new version into the cache
+
+    Meant to run off the request path: `prepare(name, frame)` builds
+    derived data such as rollups for the new version before it replaces
+    the cached one, and until then sessions keep reading the previous
+    version without waiting. Returns whether a new version was swapped in.
+    """
+    key = (name, os.path.abspath(data_dir))
+    with _dataset_lock(key), span('refresh_dataset', dataset=name) as attrs:
+        fingerprint = dataset_fingerprint(name, data_dir)
+        cached = _dataset_cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return False
+
+        data, state = _load_version(name, data_dir, cached, fingerprint, True, attrs)
+        if prepare is not None:
+            prepare(name, data)
+            _prepared[key] = data.attrs['version']
+        _dataset_cache[key] = (fingerprint, data, state)
+        return True
+
+def invalidate_data_cache(name=None):
+    """Drop cached datasets so the next load re-reads them from disk"""
+    with _cache_lock:
+        for key in list(_dataset_cache):
+            if name is None or key[0] == name:
+                del _dataset_cache[key]
+
+def peek_dataset(name, data_dir=DATA_DIR, refresh=True):
+    """Return a dataset if its current version is already loaded, without loading it
+
+    With refresh=False any loaded version is returned, as in load_dataset.
+    """
+    key = (name, os.path.abspath(data_dir))
+    cached = _dataset_cache.get(key)
+    if cached is None or (refresh and cached[0] != dataset_fingerprint(name, data_dir)):
+        return None
+    return cached[1]
+
+# Datasets that are not on screen yet are loaded here, off the request path
+PREFETCH_WORKERS = 2
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='dataset-prefetch')
+_prefetches = {}
+# Version of each cached dataset whose derived aggregates have been built,
+# by a prefetch `then` or a refresh `prepare`
+_prepared = {}
+
+def _prefetch(name, data_dir, then, refresh):
+    data = load_dataset(name, data_dir, refresh=refresh)
+    if then is not None:
+        then(name, data)
+        _prepared[(name, os.path.abspath(data_dir))] = data.attrs.get('version')
+    return data
+
+def prefetch_datasets(names, data_dir=DATA_DIR, then=None, refresh=True):
+    """Load datasets in background threads unless they are loaded or loading
+
+    `then(name, frame)` runs in the same background thread after each load,
+    e.g. to build derived aggregates; datasets whose loaded version it has
+    already run for are skipped. A request that needs a dataset while its
+    prefetch is running waits on the same per-dataset lock instead of
+    loading it a second time. `refresh` is passed on to load_dataset, so
+    while a background refresh owns reloads a prefetch never loads a
+    changed source itself.
+    """
+    futures = []
+    for name in names:
+        key = (name, os.path.abspath(data_dir))
+        with _cache_lock:
+            future = _prefetches.get(key)
+            if future is not None and not future.done():
+                futures.append(future)
+                continue
+        data = peek_dataset(name, data_dir, refresh=refresh)
+        if data is not None and (then is None or _prepared.get(key) == data.attrs.get('version')):
+            continue
+        future = _prefetch_pool.submit(_prefetch, name, data_dir, then, refresh)
+        with _cache_lock:
+            _prefetches[key] = future
+        futures.append(future)
+    return futures
+
+def load_real_data(data_dir=DATA_DIR):
+    """Load data from CSV files if available, otherwise use sample data
+
+    With per-site directories the three datasets are loaded concurrently,
+    so the files of every site and dataset are parsed by the worker
+    processes at the same time.
+    """
+    if find_sites(data_dir):
+        with ThreadPoolExecutor(max_workers=len(DATASETS)) as pool:
+            stope_data, blast_data, equipment_data = pool.map(lambda name: load_dataset(name, data_dir), DATASETS)
+        return stope_data, blast_data, equipment_data
+
+    stope_data = load_dataset('stope', data_dir)
+    blast_data = load_dataset('blast', data_dir)
+    equipment_data = load_dataset('equipment', data_dir)
+
     return stope_data, blast_data, equipment_data
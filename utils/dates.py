@@ -0,0 +1,16 @@
+import pandas as pd
+
+def date_bounds(dates, start_date=None, end_date=None):
+    """Return the positions of a sorted datetime64 array bounding start_date to end_date
+
+    end_date is inclusive of the whole day; either date may be None.
+    dates[lo:hi] are the dates in the range.
+    """
+    lo = 0
+    hi = len(dates)
+    if start_date is not None:
+        lo = dates.searchsorted(pd.Timestamp(start_date).to_datetime64(), side='left')
+    if end_date is not None:
+        end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        hi = dates.searchsorted(end.to_datetime64(), side='left')
+    return lo, hi
@@ -0,0 +1,62 @@
+import pandas as pd
+import numpy as np
+
+# Histograms never get more bins than this, whatever the number of values
+MAX_BINS = 100
+# Box whiskers reach the furthest values within this many IQRs of the box
+WHISKER_IQR = 1.5
+# Points beyond the whiskers drawn per box, the most extreme first
+MAX_OUTLIERS_PER_GROUP = 50
+
+def histogram_bins(values, bins='auto', max_bins=MAX_BINS):
+    """Count values into equal-width bins
+
+    Returns a frame with the bin_start, bin_end and count of each bin. The
+    bin count follows NumPy's rule for `bins`, capped at max_bins, so the
+    result stays small however many values there are. Missing values are
+    ignored.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return pd.DataFrame({'bin_start': [], 'bin_end': [], 'count': []})
+
+    edges = np.histogram_bin_edges(values, bins=bins)
+    if len(edges) - 1 > max_bins:
+        edges = np.linspace(values.min(), values.max(), max_bins + 1)
+    counts, edges = np.histogram(values, bins=edges)
+    return pd.DataFrame({'bin_start': edges[:-1], 'bin_end': edges[1:], 'count': counts})
+
+def box_statistics(df, value, group, max_outliers=MAX_OUTLIERS_PER_GROUP):
+    """Return the quartiles, whisker ends and outliers of a column per group
+
+    The first frame has one row per group with count, q1, median, q3 and
+    the lowerfence/upperfence whisker ends (the furthest values within
+    WHISKER_IQR interquartile ranges of the box), as Plotly box traces
+    expect. The second holds up to max_outliers values beyond the whiskers
+    per group, the furthest from the median first.
+    """
+    data = pd.DataFrame({group: df[group], value: df[value].astype('float64')}).dropna()
+    grouped = data.groupby(group, observed=True, sort=True)[value]
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats = pd.DataFrame({
+        'count': grouped.size(),
+        'q1': quartiles[0.25],
+        'median': quartiles[0.5],
+        'q3': quartiles[0.75],
+    })
+    iqr = stats['q3'] - stats['q1']
+
+    keys = data[group]
+    values = data[value]
+    low = (stats['q1'] - WHISKER_IQR * iqr).reindex(keys).to_numpy()
+    high = (stats['q3'] + WHISKER_IQR * iqr).reindex(keys).to_numpy()
+    inside = ((values >= low) & (values <= high)).to_numpy()
+    stats['lowerfence'] = values[inside].groupby(keys[inside], observed=True).min()
+    stats['upperfence'] = values[inside].groupby(keys[inside], observed=True).max()
+
+    outliers = data[~inside]
+    distance = (outliers[value] - stats['median'].reindex(outliers[group]).to_numpy()).abs()
+    outliers = outliers.iloc[np.argsort(-distance.to_numpy(), kind='stable')]
+    outliers = outliers.groupby(group, observed=True, sort=False).head(max_outliers)
+    return stats.reset_index(), outliers.reset_index(drop=True)
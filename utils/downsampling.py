@@ -0,0 +1,125 @@
+import pandas as pd
+import numpy as np
+
+# Streamlit renders each chart in a half-width column of a wide layout,
+# which is roughly this many pixels across on a typical screen.
+DEFAULT_CHART_WIDTH = 800
+POINTS_PER_PIXEL = 2
+MIN_POINTS_PER_SERIES = 50
+MAX_POINTS_PER_CHART = 50000
+
+def series_point_budget(n_series, chart_width=DEFAULT_CHART_WIDTH):
+    """Return how many points to keep per series for a chart of the given width"""
+    per_series = chart_width * POINTS_PER_PIXEL
+    shared = MAX_POINTS_PER_CHART // max(n_series, 1)
+    return max(min(per_series, shared), MIN_POINTS_PER_SERIES)
+
+def min_max_indices(y, n_out):
+    """Return indices keeping the minimum and maximum of each bucket of y
+
+    The first and last points are kept, and the rest of the budget is split
+    into (n_out - 2) // 2 equal buckets whose extremes are kept, so peaks
+    and troughs survive the reduction and at most n_out points remain (for
+    n_out of at least 4). Buckets are reduced with ufunc.reduceat,
+    without a Python loop.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    n_buckets = max((n_out - 2) // 2, 1)
+    starts = np.unique(np.linspace(0, n, n_buckets, endpoint=False).astype(np.int64))
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+
+    low = np.where(np.isnan(y), np.inf, y)
+    high = np.where(np.isnan(y), -np.inf, y)
+    mins = np.minimum.reduceat(low, starts)
+    maxs = np.maximum.reduceat(high, starts)
+
+    # First position in each bucket that attains the bucket's min / max
+    min_hits = np.flatnonzero(low == mins[bucket])
+    max_hits = np.flatnonzero(high == maxs[bucket])
+    _, first_min = np.unique(bucket[min_hits], return_index=True)
+    _, first_max = np.unique(bucket[max_hits], return_index=True)
+
+    keep = np.concatenate(([0, n - 1], min_hits[first_min], max_hits[first_max]))
+    return np.unique(keep)
+
+def lttb_indices(x, y, n_out):
+    """Return indices selected by Largest-Triangle-Three-Buckets
+
+    LTTB picks, in each bucket, the point forming the largest triangle with
+    the previously selected point and the mean of the next bucket. The
+    choice depends on the previous bucket, so buckets are walked in order,
+    but the work inside each bucket is vectorized.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def _numeric(values):
+    """Return values as a float64 array, mapping datetimes to nanoseconds"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy().view(np.int64).astype(np.float64)
+    return values.to_numpy(dtype=np.float64)
+
+def downsample_frame(df, x, y, group=None, n_out=None, method='minmax',
+                     chart_width=DEFAULT_CHART_WIDTH):
+    """Reduce each series of df to a point budget before building a figure
+
+    Rows are grouped by the `group` column (one series per group) and each
+    series is reduced to at most `n_out` points, derived from the chart
+    width when not given. Rows with a missing y value are dropped. The
+    result keeps the original row order and columns.
+    """
+    df = df[df[y].notna()]
+    if group is None:
+        series = {None: np.arange(len(df))}
+    else:
+        series = df.groupby(group, observed=True, sort=False).indices
+
+    if n_out is None:
+        n_out = series_point_budget(len(series), chart_width)
+    if all(len(positions) <= n_out for positions in series.values()):
+        return df
+
+    xs = _numeric(df[x])
+    ys = _numeric(df[y])
+    keep = []
+    for positions in series.values():
+        if len(positions) <= n_out:
+            keep.append(positions)
+            continue
+        order = np.argsort(xs[positions], kind='stable')
+        positions = positions[order]
+        if method == 'lttb':
+            selected = lttb_indices(xs[positions], ys[positions], n_out)
+        else:
+            selected = min_max_indices(ys[positions], n_out)
+        keep.append(positions[selected])
+
+    return df.iloc[np.sort(np.concatenate(keep))]
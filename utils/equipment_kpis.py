@@ -0,0 +1,173 @@
+import pandas as pd
+from utils.dates import date_bounds
+from utils.rollups import GRAINS, VersionedCache, merge_periods
+
+# Calendar hours covered by one record: a unit-day, or a single shift when
+# the data has a `shift` column
+DAY_HOURS = 24
+SHIFT_HOURS = 12
+# Columns KPIs can be broken down by besides the day, when the data has them
+KPI_KEYS = ('site', 'equipment_type', 'equipment_id', 'shift')
+# Hour and consumption columns averaged per record
+RECORD_MEASURES = ['hours_operated', 'maintenance_hours', 'downtime_hours', 'fuel_consumption']
+# Hours summed per group, from which every KPI is derived
+HOURS = ['calendar_hours', 'available_hours', 'operated_hours', 'effective_hours']
+RECORDS = 'records'
+
+def _record_hours(df):
+    """Return the calendar hours each record of an equipment frame covers"""
+    return SHIFT_HOURS if 'shift' in df.columns else DAY_HOURS
+
+def _kpi_sums(df, keys):
+    """Compute the summed hours of every record, keyed for one groupby"""
+    hours = _record_hours(df)
+    work = pd.DataFrame({key: df[key] for key in keys if key != 'period'}, index=df.index)
+    if 'period' in keys:
+        work.insert(0, 'period', df['date'].dt.floor('D'))
+    work[RECORDS] = 1
+
+    # Time lost to maintenance and breakdowns leaves the hours the unit was available
+    lost = pd.Series(0.0, index=df.index)
+    for column in ('maintenance_hours', 'downtime_hours'):
+        if column in df.columns:
+            lost += df[column].astype('float64').fillna(0)
+    if 'hours_operated' in df.columns:
+        operated = df['hours_operated'].astype('float64').fillna(0)
+    else:
+        operated = df['utilization_rate'].astype('float64').fillna(0) * hours / 100
+    performance = (df['performance_rate'].astype('float64').fillna(100) / 100
+                   if 'performance_rate' in df.columns else 1.0)
+
+    work['calendar_hours'] = float(hours)
+    work['available_hours'] = (hours - lost).clip(0, hours)
+    work['operated_hours'] = operated
+    work['effective_hours'] = operated * performance
+    for column in RECORD_MEASURES:
+        if column in df.columns:
+            values = df[column].astype('float64')
+            work[f"{column}__sum"] = values.fillna(0)
+            work[f"{column}__count"] = values.notna().astype('int64')
+    return work
+
+def _regroup(frame, keys):
+    """Sum KPI rows onto a set of keys, sorted by them"""
+    if not keys:
+        return frame.drop(columns=[c for c in frame.columns if c in ('period', *KPI_KEYS)]).sum().to_frame().T
+    return frame.groupby(list(keys), observed=True, sort=True).sum(numeric_only=True).reset_index()
+
+def _ratio(numerator, denominator):
+    return (100 * numerator / denominator).where(denominator > 0)
+
+class EquipmentKPIs:
+    """Summed hours of equipment records by day, site, type, unit and shift
+
+    `frame` has one row per (period, *keys) with the number of records,
+    the calendar, available, operated and effective (operated times
+    performance) hours and the sum and count of each RECORD_MEASURES
+    column. Every KPI is a ratio of these sums, so any breakdown is a
+    regrouping of this frame rather than another pass over the raw rows.
+    Summary data without dates has no period column. `rated` is whether the
+    data has a performance_rate column; without one performance and OEE
+    are not measured and are left out of summaries.
+    """
+
+    def __init__(self, frame, keys, dated, rated=False):
+        self.frame = frame
+        self.keys = tuple(keys)
+        self.dated = dated
+        self.rated = rated
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    @property
+    def measures(self):
+        """RECORD_MEASURES columns present in the data"""
+        return [m for m in RECORD_MEASURES if f"{m}__sum" in self.frame.columns]
+
+    def slice(self, start_date=None, end_date=None):
+        """Return the KPIs of days within the date range; undated KPIs are returned as they are"""
+        if not self.dated or (start_date is None and end_date is None):
+            return self
+        lo, hi = date_bounds(self.frame['period'].to_numpy(), start_date, end_date)
+        return EquipmentKPIs(self.frame.iloc[lo:hi], self.keys, self.dated, self.rated)
+
+    def filter(self, column, values=None):
+        """Return the KPIs of rows whose `column` is one of `values`; None keeps every row"""
+        if values is None or column not in self.keys:
+            return self
+        frame = self.frame[self.frame[column].isin(values)]
+        return EquipmentKPIs(frame, self.keys, self.dated, self.rated)
+
+    def summarize(self, by=None, grain='day'):
+        """Return the KPIs grouped by `by`, with 'period' bucketed to `grain`
+
+        Availability is available over calendar hours, use of availability
+        operated over available hours, utilization_rate operated over
+        calendar hours, performance effective over operated hours and oee
+        their product, effective over calendar hours; all in percent.
+        Performance and OEE are only given for rated data. Each
+        RECORD_MEASURES column is averaged per record and operating_hours is
+        the total of hours_operated.
+        """
+        if by is None:
+            by = []
+        elif isinstance(by, str):
+            by = [by]
+        frame = self.frame
+        if 'period' in by and grain != 'day':
+            frame = frame.assign(period=frame['period'].dt.to_period(GRAINS[grain]).dt.start_time)
+        sums = _regroup(frame, by)
+
+        summary = sums[list(by) + [RECORDS] + HOURS].copy()
+        summary['availability'] = _ratio(sums['available_hours'], sums['calendar_hours'])
+        summary['use_of_availability'] = _ratio(sums['operated_hours'], sums['available_hours'])
+        summary['utilization_rate'] = _ratio(sums['operated_hours'], sums['calendar_hours'])
+        if self.rated:
+            summary['performance'] = _ratio(sums['effective_hours'], sums['operated_hours'])
+            summary['oee'] = _ratio(sums['effective_hours'], sums['calendar_hours'])
+        summary['operating_hours'] = sums['operated_hours']
+        for measure in self.measures:
+            count = sums[f"{measure}__count"]
+            summary[measure] = (sums[f"{measure}__sum"] / count).where(count > 0)
+        return summary
+
+    def totals(self):
+        """Return the fleet-wide KPIs as a dict"""
+        return self.summarize().iloc[0].to_dict()
+
+def build_equipment_kpis(df):
+    """Sum the hours of every equipment record in one groupby pass
+
+    Records are grouped by day (unless the data is an undated summary) and
+    by every KPI_KEYS column present.
+    """
+    dated = 'date' in df.columns and not df.attrs.get('undated')
+    keys = [key for key in KPI_KEYS if key in df.columns]
+    group = (['period'] if dated else []) + keys
+    frame = _regroup(_kpi_sums(df, group), group)
+    return EquipmentKPIs(frame, keys, dated, 'performance_rate' in df.columns)
+
+def extend_equipment_kpis(kpis, new_rows):
+    """Merge the KPI sums of newly appended rows into existing ones
+
+    Sums add up, so only the rows from the first day touched by the new
+    data are regrouped.
+    """
+    if new_rows.empty:
+        return kpis
+    new_kpis = build_equipment_kpis(new_rows)
+    if not kpis.dated or not new_kpis.dated or new_kpis.keys != kpis.keys or new_kpis.rated != kpis.rated:
+        return None
+    frame = merge_periods(kpis.frame, new_kpis.frame, ['period', *kpis.keys], _regroup)
+    return EquipmentKPIs(frame, kpis.keys, kpis.dated, kpis.rated)
+
+# KPI sums are shared across sessions like the rollups, keeping the previous
+# version for sessions still reading it
+KPI_VERSIONS = 2
+_kpi_cache = VersionedCache(KPI_VERSIONS)
+
+def get_equipment_kpis(df):
+    """Return the KPI sums of the loaded equipment dataset, building them once per data version"""
+    return _kpi_cache.get('equipment', df, build_equipment_kpis, extend_equipment_kpis)
@@ -0,0 +1,40 @@
+import json
+import os
+import plotly.utils
+from utils.profiling import span
+from utils.sized_cache import SizedCache
+
+# Upper bound on the serialized figures kept in memory, shared by all sessions
+FIGURE_CACHE_MB = int(os.environ.get('DASHBOARD_FIGURE_CACHE_MB', '256'))
+
+def serialize_figure(figure):
+    """Encode a Plotly figure to the JSON spec st.plotly_chart sends to the browser"""
+    return json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder)
+
+# Each entry is the dict of JSON specs of one view's figures
+_figure_cache = SizedCache(FIGURE_CACHE_MB * 1024 * 1024)
+
+def cached_figures(view, key, build):
+    """Return the figures of a view, building and serializing them only on a miss
+
+    `build()` returns a dict of Plotly figures. They are cached as JSON
+    specs under (view, key), where `key` identifies everything the figures
+    depend on: the active filters and the data version. With a key of None
+    the figures are built and returned unserialized.
+    """
+    if key is None:
+        return build()
+    with span('figure_cache', view=view) as attrs:
+        specs = _figure_cache.get((view, key))
+        attrs['result'] = 'miss' if specs is None else 'hit'
+        if specs is None:
+            specs = {name: serialize_figure(figure) for name, figure in build().items()}
+            _figure_cache.put((view, key), specs, sum(len(spec) for spec in specs.values()))
+        return specs
+
+def figure_cache_stats():
+    """Return the hit/miss/eviction counters and size of the figure cache"""
+    return _figure_cache.stats()
+
+def clear_figure_cache():
+    _figure_cache.clear()
@@ -0,0 +1,97 @@
+import io
+import os
+import zlib
+
+# Bytes hashed at the start of a file and just before the last ingested
+# offset to recognise a file that was rewritten rather than appended to.
+ANCHOR_BYTES = 64 * 1024
+
+class SourceState:
+    """How far a growing CSV source has been ingested
+
+    `offset` is the byte position just after the last complete line that
+    has been parsed and `rows` the number of data rows read so far.
+    """
+
+    def __init__(self, path, offset, rows, header, head_crc, tail_crc):
+        self.path = path
+        self.offset = offset
+        self.rows = rows
+        self.header = header
+        self.head_crc = head_crc
+        self.tail_crc = tail_crc
+
+def _read_range(handle, start, stop):
+    handle.seek(start)
+    return handle.read(max(stop - start, 0))
+
+def _anchors(handle, offset):
+    """Return checksums of the first bytes and the bytes ending at offset"""
+    head = _read_range(handle, 0, min(offset, ANCHOR_BYTES))
+    tail = _read_range(handle, max(offset - ANCHOR_BYTES, 0), offset)
+    return zlib.crc32(head), zlib.crc32(tail)
+
+class _Prefix(io.RawIOBase):
+    """Raw reader over the first bytes of an open file"""
+
+    def __init__(self, handle, size):
+        self._handle = handle
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._handle.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._handle.close()
+        super().close()
+
+def open_prefix(path, size):
+    """Open the first `size` bytes of a file, ignoring anything appended since it was sized"""
+    return io.BufferedReader(_Prefix(open(path, 'rb'), size))
+
+def capture_state(path, offset, rows):
+    """Record the ingest state of a CSV that has been parsed up to offset bytes"""
+    with open(path, 'rb') as handle:
+        header = handle.readline()
+        head_crc, tail_crc = _anchors(handle, offset)
+    return SourceState(path, offset, rows, header, head_crc, tail_crc)
+
+def read_appended(state):
+    """Return (header, new_bytes, new_state) for rows appended since state
+
+    new_bytes holds only complete lines, ready to be parsed after the
+    header. Returns None when the file shrank or its already-ingested bytes
+    changed, in which case the caller must reload the file in full.
+    """
+    size = os.path.getsize(state.path)
+    if size < state.offset:
+        print(f"Source truncated, full reload needed: {state.path}")
+        return None
+
+    with open(state.path, 'rb') as handle:
+        if _anchors(handle, state.offset) != (state.head_crc, state.tail_crc):
+            print(f"Source rewritten, full reload needed: {state.path}")
+            return None
+
+        # A partially parsed last line would desynchronise the columns
+        previous = _read_range(handle, state.offset - 1, state.offset) if state.offset else b'\n'
+        appended = _read_range(handle, state.offset, size)
+        if previous != b'\n' and appended and not appended.startswith((b'\n', b'\r\n')):
+            print(f"Source does not end on a line boundary, full reload needed: {state.path}")
+            return None
+
+        # Leave a trailing partial line for the next refresh
+        end = appended.rfind(b'\n') + 1
+        new_bytes = appended[:end]
+        offset = state.offset + end
+        head_crc, tail_crc = _anchors(handle, offset)
+
+    # The caller adds the number of parsed rows once it has parsed new_bytes
+    new_state = SourceState(state.path, offset, state.rows, state.header, head_crc, tail_crc)
+    return state.header, new_bytes, new_state
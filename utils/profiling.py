@@ -0,0 +1,114 @@
+import contextlib
+import os
+import threading
+import time
+
+# Profiling is opt-in; this only sets the default of the sidebar toggle
+PROFILE_BY_DEFAULT = os.environ.get('DASHBOARD_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+_local = threading.local()
+
+class _NullSpan:
+    """Stand-in yielded by span() when no profile is active"""
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class RenderProfile:
+    """Timed spans recorded during one rerun of the app
+
+    Each span has a name, start offset and duration in seconds, the
+    thread it ran on and free-form attributes such as row counts.
+    """
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans = []
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        record = {'name': name, 'start': time.perf_counter() - self._origin,
+                  'thread': threading.get_ident(), 'depth': self._depth(), 'args': attributes}
+        _local.depth = record['depth'] + 1
+        try:
+            yield attributes
+        finally:
+            _local.depth = record['depth']
+            record['duration'] = time.perf_counter() - self._origin - record['start']
+            self.spans.append(record)
+
+    @staticmethod
+    def _depth():
+        return getattr(_local, 'depth', 0)
+
+    def total(self):
+        """Wall time covered by the outermost spans"""
+        return sum(s['duration'] for s in self.spans if s['depth'] == 0)
+
+    def trace_events(self, pid=1):
+        """Return the spans as Chrome trace 'complete' events"""
+        origin_us = self.started_at * 1e6
+        return [{
+            'name': s['name'],
+            'ph': 'X',
+            'ts': origin_us + s['start'] * 1e6,
+            'dur': s['duration'] * 1e6,
+            'pid': pid,
+            'tid': s['thread'],
+            'args': {k: _jsonable(v) for k, v in s['args'].items()},
+        } for s in sorted(self.spans, key=lambda s: s['start'])]
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+def chrome_trace(profiles):
+    """Return a Chrome trace (chrome://tracing, Perfetto) document for several reruns"""
+    events = []
+    for profile in profiles:
+        events.extend(profile.trace_events())
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def start_profile(label=''):
+    """Start recording spans for the current thread's rerun"""
+    _local.profile = RenderProfile(label)
+    _local.depth = 0
+    return _local.profile
+
+def stop_profile():
+    """Stop recording and return the finished profile, if any"""
+    profile = getattr(_local, 'profile', None)
+    _local.profile = None
+    return profile
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+def profiling_enabled():
+    return getattr(_local, 'profile', None) is not None
+
+def span(name, **attributes):
+    """Time a block in the active profile
+
+    Use as `with span('stage', rows=n) as attrs:`; extra attributes can be
+    added to `attrs` inside the block. Without an active profile this
+    returns a shared no-op context, so instrumentation costs one lookup.
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return _NULL_SPAN
+    return profile.span(name, **attributes)
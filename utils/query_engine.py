@@ -0,0 +1,536 @@
+import contextlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils.data_loader import (
+    DATA_DIR, SIDECAR_DIR, apply_schema, dataset_fingerprint, filter_by_date, filter_by_site,
+    invalidate_data_cache, load_dataset, peek_dataset, prefetch_datasets, read_dataset, refresh_dataset,
+    sort_by_date,
+)
+from utils.rollups import (
+    GRAINS, PARTITIONS, ROLLUP_SPECS, ROWS, RollupCube, filter_rollups, get_rollups, slice_rollups,
+)
+from utils.equipment_kpis import (
+    DAY_HOURS, KPI_KEYS, RECORD_MEASURES, RECORDS, SHIFT_HOURS, EquipmentKPIs, get_equipment_kpis,
+)
+from utils.profiling import span
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional; the SQLite backend needs only the standard library
+    duckdb = None
+
+# Storage backend used by the app: 'csv' keeps whole datasets in memory as
+# pandas frames, 'sqlite' and 'duckdb' keep them in an embedded database
+# and push the aggregations down to it
+BACKENDS = ('csv', 'sqlite', 'duckdb')
+BACKEND = os.environ.get('DASHBOARD_BACKEND', 'csv').lower()
+
+# Columns indexed in the database besides the date
+INDEXED_COLUMNS = ['stope_id', 'blast_id', 'equipment_id']
+INSERT_CHUNK_ROWS = 50000
+
+def _timestamp(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+
+def _restrict(rollups, undated, start_date, end_date, sites):
+    """Slice a rollup set to a date range, unless its dates are placeholders, and to some sites"""
+    if not undated:
+        rollups = slice_rollups(rollups, start_date, end_date)
+    return filter_rollups(rollups, 'site', sites)
+
+class FrameEngine:
+    """Datasets parsed from CSV and held in memory as pandas frames
+
+    This is the default backend; the frames and their rollups are shared
+    by every session in the process.
+    """
+
+    backend = 'csv'
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        # Set while a RefreshScheduler swaps in new versions (see utils/refresh.py);
+        # requests then serve the loaded version without checking its source
+        self.background_refresh = False
+
+    def _load(self, name):
+        return load_dataset(name, self.data_dir, refresh=not self.background_refresh)
+
+    def date_extent(self, name):
+        """Return the first and last date of a dataset, or None if it has no dates"""
+        data = self._load(name)
+        if data.empty or data.attrs.get('undated'):
+            return None
+        return data['date'].iloc[0], data['date'].iloc[-1]
+
+    def rollups(self, name, start_date=None, end_date=None, sites=None):
+        """Return the rollup cubes of a dataset restricted to a date range and sites"""
+        data = self._load(name)
+        return _restrict(get_rollups(name, data), data.attrs.get('undated'), start_date, end_date, sites)
+
+    def peek_rollups(self, name, start_date=None, end_date=None, sites=None):
+        """Return a dataset's rollups if it is already loaded, without loading it"""
+        data = peek_dataset(name, self.data_dir, refresh=not self.background_refresh)
+        if data is None:
+            return None
+        return _restrict(get_rollups(name, data), data.attrs.get('undated'), start_date, end_date, sites)
+
+    def fetch(self, name, start_date=None, end_date=None, sites=None):
+        """Return the rows of a dataset dated from start_date to end_date inclusive, from some sites"""
+        return filter_by_site(filter_by_date(self._load(name), start_date, end_date), sites)
+
+    def equipment_kpis(self, start_date=None, end_date=None, sites=None):
+        """Return the equipment KPI sums restricted to a date range and sites"""
+        kpis = get_equipment_kpis(self._load('equipment'))
+        return kpis.slice(start_date, end_date).filter('site', sites)
+
+    def peek_equipment_kpis(self, start_date=None, end_date=None, sites=None):
+        """Return the equipment KPI sums if the dataset is already loaded, without loading it"""
+        data = peek_dataset('equipment', self.data_dir, refresh=not self.background_refresh)
+        if data is None:
+            return None
+        return get_equipment_kpis(data).slice(start_date, end_date).filter('site', sites)
+
+    @staticmethod
+    def _prepare(name, data):
+        """Build the derived aggregates of a newly loaded dataset"""
+        # Equipment is charted from its KPI sums, which replace the rollups
+        if name == 'equipment':
+            get_equipment_kpis(data)
+        else:
+            get_rollups(name, data)
+
+    def prefetch(self, names):
+        """Load datasets and their aggregates in the background"""
+        return prefetch_datasets(names, self.data_dir, then=self._prepare, refresh=not self.background_refresh)
+
+    def refresh(self, name):
+        """Load a changed dataset and its aggregates, then swap them in; returns whether it changed"""
+        return refresh_dataset(name, self.data_dir, prepare=self._prepare)
+
+    def invalidate(self, name=None):
+        invalidate_data_cache(name)
+
+class SqlEngine:
+    """Datasets ingested into an embedded database and queried with SQL
+
+    Each dataset is a table indexed on its date and id columns. Rollup
+    cubes are computed with GROUP BY queries and only the aggregated rows
+    come back to Python; raw rows are fetched per date range. A table is
+    re-ingested from its CSV (or the sample data) whenever the source
+    fingerprint changes. Subclasses provide the connection, bulk insert and
+    period bucketing of a database engine.
+    """
+
+    backend = None
+    database_name = None
+    # SQL expression truncating `{column}` to the start of each grain's period
+    PERIODS = {}
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, SIDECAR_DIR, self.database_name)
+        self._versions = {}
+        self._rollups = {}
+        self._kpis = None
+        self.background_refresh = False
+        self._locks = {name: threading.Lock() for name in ROLLUP_SPECS}
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.backend}-prefetch")
+        self._prefetches = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS datasets "
+                         "(name VARCHAR PRIMARY KEY, version VARCHAR, undated BOOLEAN, row_count BIGINT)")
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _query(self, sql, params=()):
+        raise NotImplementedError
+
+    def _insert(self, conn, name, data):
+        raise NotImplementedError
+
+    def _source_version(self, name):
+        fingerprint = dataset_fingerprint(name, self.data_dir)
+        return str(fingerprint) if fingerprint is not None else 'sample'
+
+    def _stored_meta(self, name):
+        rows = self._query("SELECT version, undated FROM datasets WHERE name = ?", [name])
+        if rows.empty:
+            return None
+        return rows['version'].iloc[0], bool(rows['undated'].iloc[0])
+
+    def sync(self, name):
+        """Make sure the table of a dataset holds the current version of its source
+
+        Returns (version, undated).
+        """
+        known = self._versions.get(name)
+        if known is not None and self.background_refresh:
+            return known
+        version = self._source_version(name)
+        if known is not None and known[0] == version:
+            return known
+        with self._locks[name], span('sync_table', dataset=name, backend=self.backend) as attrs:
+            known = self._versions.get(name)
+            if known is not None and known[0] == version:
+                return known
+            stored = self._stored_meta(name)
+            if stored is None or stored[0] != version:
+                data, _ = read_dataset(name, self.data_dir)
+                undated = bool(data.attrs.get('undated'))
+                self._ingest(name, data, version, undated)
+                attrs['rows'] = len(data)
+                stored = (version, undated)
+            self._versions[name] = stored
+            return stored
+
+    def _ingest(self, name, data, version, undated):
+        self._swap(name, self._stage(name, data), version, undated, data.columns, len(data))
+
+    def _stage(self, name, data):
+        """Insert a new version of a dataset into a staging table and return its name"""
+        print(f"Ingesting {len(data)} {name} rows into {self.path}")
+        # Categoricals are stored as plain text and re-typed on the way out
+        data = data.astype({column: 'object' for column in data.columns
+                            if isinstance(data[column].dtype, pd.CategoricalDtype)})
+        staging = f"{name}__staging"
+        with self._connect() as conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            self._insert(conn, staging, data)
+        return staging
+
+    def _swap(self, name, staging, version, undated, columns, row_count):
+        # Swap the new table in within one transaction, so concurrent readers
+        # see either the old version or the new one
+        with self._connect() as conn:
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{name}"')
+            conn.execute(f'CREATE INDEX "ix_{name}_date" ON "{name}" (date)')
+            for column in INDEXED_COLUMNS:
+                if column in columns:
+                    conn.execute(f'CREATE INDEX "ix_{name}_{column}" ON "{name}" ("{column}")')
+            conn.execute("DELETE FROM datasets WHERE name = ?", [name])
+            conn.execute("INSERT INTO datasets VALUES (?, ?, ?, ?)", [name, version, undated, row_count])
+            conn.execute("COMMIT")
+
+    def _columns(self, name):
+        return list(self._query(f'SELECT * FROM "{name}" LIMIT 0').columns)
+
+    def date_extent(self, name):
+        """Return the first and last date of a dataset, or None if it has no dates"""
+        _, undated = self.sync(name)
+        if undated:
+            return None
+        extent = self._query(f'SELECT MIN(date) AS first, MAX(date) AS last FROM "{name}"')
+        if extent['first'].isna().iloc[0]:
+            return None
+        return pd.Timestamp(extent['first'].iloc[0]), pd.Timestamp(extent['last'].iloc[0])
+
+    def _rollup_sql(self, name, grain, dims, measures):
+        period = self.PERIODS[grain].format(column='date')
+        keys = ', '.join(['period'] + [f'"{d}"' for d in dims])
+        select = [f"{period} AS period"] + [f'"{d}"' for d in dims] + [f'COUNT(*) AS "{ROWS}"']
+        for m in measures:
+            # Measures may be stored as float32; accumulate in double precision as pandas does
+            value = f'CAST("{m}" AS DOUBLE)'
+            select += [
+                f'COUNT("{m}") AS "{m}__count"',
+                f'COALESCE(SUM({value}), 0) AS "{m}__sum"',
+                f'COALESCE(SUM({value} * {value}), 0) AS "{m}__sumsq"',
+                f'MIN("{m}") AS "{m}__min"',
+                f'MAX("{m}") AS "{m}__max"',
+            ]
+        return f'SELECT {", ".join(select)} FROM "{name}" GROUP BY {keys} ORDER BY {keys}'
+
+    def _build_rollups(self, name, table=None):
+        spec = ROLLUP_SPECS[name]
+        table = table or name
+        columns = self._columns(table)
+        partitions = [p for p in PARTITIONS if p in columns]
+        dimensions = [d for d in dict.fromkeys(sum(spec['dimensions'], ())) if d in columns]
+        measures = [m for m in spec['measures'] if m in columns]
+        cubes = {}
+        for grain in GRAINS:
+            for dims in spec['dimensions']:
+                if not all(d in dimensions for d in dims):
+                    continue
+                keys = partitions + list(dims)
+                frame = apply_schema(self._query(self._rollup_sql(table, grain, keys, measures)), name)
+                frame['period'] = pd.to_datetime(frame['period']).astype('datetime64[ns]')
+                for column in frame.columns.difference(['period', ROWS, *keys]):
+                    frame[column] = frame[column].astype('int64' if column.endswith('__count') else 'float64')
+                cubes[(grain, dims)] = RollupCube(frame, grain, keys, measures)
+        return cubes
+
+    def _all_rollups(self, name):
+        version, undated = self.sync(name)
+        cached = self._rollups.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1], undated
+        with self._locks[name], span('sql_rollups', dataset=name, backend=self.backend):
+            cached = self._rollups.get(name)
+            if cached is None or cached[0] != version:
+                cached = (version, self._build_rollups(name))
+                self._rollups[name] = cached
+            return cached[1], undated
+
+    def _kpi_sql(self, table, columns, dated):
+        hours = SHIFT_HOURS if 'shift' in columns else DAY_HOURS
+        dims = [f'"{k}"' for k in KPI_KEYS if k in columns]
+        keys = (['period'] if dated else []) + dims
+        lost = ' + '.join(f'COALESCE(CAST("{c}" AS DOUBLE), 0)' for c in ('maintenance_hours', 'downtime_hours')
+                          if c in columns) or '0'
+        available = f"{hours} - ({lost})"
+        if 'hours_operated' in columns:
+            operated = 'COALESCE(CAST("hours_operated" AS DOUBLE), 0)'
+        else:
+            operated = f'COALESCE(CAST("utilization_rate" AS DOUBLE), 0) * {hours} / 100'
+        effective = operated
+        if 'performance_rate' in columns:
+            effective = f'{operated} * COALESCE(CAST("performance_rate" AS DOUBLE), 100) / 100'
+        select = ([f"{self.PERIODS['day'].format(column='date')} AS period"] if dated else []) + dims + [
+            f'COUNT(*) AS "{RECORDS}"',
+            f'CAST(COUNT(*) * {hours} AS DOUBLE) AS calendar_hours',
+            f'COALESCE(SUM(CASE WHEN {available} < 0 THEN 0 WHEN {available} > {hours} THEN {hours} '
+            f'ELSE {available} END), 0) AS available_hours',
+            f'COALESCE(SUM({operated}), 0) AS operated_hours',
+            f'COALESCE(SUM({effective}), 0) AS effective_hours',
+        ]
+        for m in RECORD_MEASURES:
+            if m in columns:
+                select += [f'COALESCE(SUM(CAST("{m}" AS DOUBLE)), 0) AS "{m}__sum"', f'COUNT("{m}") AS "{m}__count"']
+        group = f' GROUP BY {", ".join(keys)} ORDER BY {", ".join(keys)}' if keys else ''
+        return f'SELECT {", ".join(select)} FROM "{table}"{group}'
+
+    def _build_equipment_kpis(self, table, undated):
+        """Sum the equipment KPI hours in the database, with the same definitions as build_equipment_kpis"""
+        columns = self._columns(table)
+        dated = not undated
+        frame = apply_schema(self._query(self._kpi_sql(table, columns, dated)), 'equipment')
+        if dated:
+            frame['period'] = pd.to_datetime(frame['period']).astype('datetime64[ns]')
+        for column in frame.columns:
+            if column.endswith('__count') or column == RECORDS:
+                frame[column] = frame[column].astype('int64')
+            elif column.endswith('__sum') or column.endswith('_hours'):
+                frame[column] = frame[column].astype('float64')
+        return EquipmentKPIs(frame, [k for k in KPI_KEYS if k in columns], dated, 'performance_rate' in columns)
+
+    def equipment_kpis(self, start_date=None, end_date=None, sites=None):
+        """Return the equipment KPI sums, aggregated in the database, restricted to a date range and sites"""
+        version, undated = self.sync('equipment')
+        cached = self._kpis
+        if cached is None or cached[0] != version:
+            with self._locks['equipment'], span('sql_equipment_kpis', backend=self.backend):
+                cached = self._kpis
+                if cached is None or cached[0] != version:
+                    cached = self._kpis = (version, self._build_equipment_kpis('equipment', undated))
+        return cached[1].slice(start_date, end_date).filter('site', sites)
+
+    def peek_equipment_kpis(self, start_date=None, end_date=None, sites=None):
+        """Return the equipment KPI sums if they are built for the current version"""
+        cached = self._kpis
+        known = self._versions.get('equipment')
+        if cached is None or known is None or cached[0] != known[0]:
+            return None
+        if not self.background_refresh and cached[0] != self._source_version('equipment'):
+            return None
+        return cached[1].slice(start_date, end_date).filter('site', sites)
+
+    def rollups(self, name, start_date=None, end_date=None, sites=None):
+        """Return the rollup cubes of a dataset, aggregated in the database, restricted to a date range and sites
+
+        Cubes are aggregated over the whole table once per version and
+        sliced like the in-memory ones, so both backends chart the same
+        periods.
+        """
+        rollups, undated = self._all_rollups(name)
+        return _restrict(rollups, undated, start_date, end_date, sites)
+
+    def peek_rollups(self, name, start_date=None, end_date=None, sites=None):
+        """Return a dataset's rollups if they are built for its current version"""
+        cached = self._rollups.get(name)
+        known = self._versions.get(name)
+        if cached is None or known is None or cached[0] != known[0]:
+            return None
+        if not self.background_refresh and cached[0] != self._source_version(name):
+            return None
+        return _restrict(cached[1], known[1], start_date, end_date, sites)
+
+    def fetch(self, name, start_date=None, end_date=None, sites=None):
+        """Return the rows of a dataset dated from start_date to end_date inclusive, from some sites"""
+        version, undated = self.sync(name)
+        clauses, params = [], []
+        if sites is not None and 'site' in self._columns(name):
+            clauses.append(f"site IN ({', '.join('?' * len(sites))})" if sites else "1 = 0")
+            params.extend(sites)
+        if not undated and start_date is not None:
+            clauses.append("date >= ?")
+            params.append(_timestamp(start_date))
+        if not undated and end_date is not None:
+            clauses.append("date < ?")
+            params.append(_timestamp(pd.Timestamp(end_date) + pd.Timedelta(days=1)))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        with span('sql_fetch', dataset=name, backend=self.backend) as attrs:
+            data = self._query(f'SELECT * FROM "{name}"{where} ORDER BY date, rowid', params)
+            attrs['rows'] = len(data)
+        data = sort_by_date(apply_schema(data, name))
+        data.attrs['version'] = version
+        if undated:
+            data.attrs['undated'] = True
+        return data
+
+    def _prepare(self, name):
+        if name == 'equipment':
+            self.equipment_kpis()
+        else:
+            self._all_rollups(name)
+
+    def prefetch(self, names):
+        """Ingest datasets and build their aggregates in the background"""
+        futures = []
+        for name in names:
+            future = self._prefetches.get(name)
+            if future is None or future.done():
+                future = self._pool.submit(self._prepare, name)
+                self._prefetches[name] = future
+            futures.append(future)
+        return futures
+
+    def refresh(self, name):
+        """Re-ingest a changed dataset and build its rollups or KPI sums, then swap both in
+
+        The new version is staged and aggregated beside the current table,
+        which keeps serving sessions until the swap. Returns whether the
+        dataset changed.
+        """
+        version = self._source_version(name)
+        known = self._versions.get(name)
+        if known is not None and known[0] == version:
+            return False
+        with self._locks[name], span('refresh_table', dataset=name, backend=self.backend) as attrs:
+            stored = self._stored_meta(name)
+            if stored is None or stored[0] != version:
+                data, _ = read_dataset(name, self.data_dir)
+                undated = bool(data.attrs.get('undated'))
+                staging = self._stage(name, data)
+                if name == 'equipment':
+                    kpis = self._build_equipment_kpis(staging, undated)
+                else:
+                    rollups = self._build_rollups(name, staging)
+                self._swap(name, staging, version, undated, data.columns, len(data))
+                attrs['rows'] = len(data)
+            else:
+                # Another process already ingested this version
+                undated = stored[1]
+                if name == 'equipment':
+                    kpis = self._build_equipment_kpis(name, undated)
+                else:
+                    rollups = self._build_rollups(name)
+            if name == 'equipment':
+                # Rollups of the old version are dropped; they are only built on request
+                self._kpis = (version, kpis)
+                self._rollups.pop(name, None)
+            else:
+                self._rollups[name] = (version, rollups)
+            self._versions[name] = (version, undated)
+            return True
+
+    def invalidate(self, name=None):
+        """Forget cached rollups so the next call re-checks the stored tables"""
+        for dataset in list(self._versions):
+            if name is None or dataset == name:
+                self._versions.pop(dataset, None)
+                self._rollups.pop(dataset, None)
+                if dataset == 'equipment':
+                    self._kpis = None
+
+class SQLiteEngine(SqlEngine):
+    """SQL engine on a SQLite file, from the standard library"""
+
+    backend = 'sqlite'
+    database_name = 'dashboard.sqlite'
+    # Dates are stored as 'YYYY-MM-DD HH:MM:SS' text; weeks start on Monday
+    PERIODS = {
+        'day': "date({column})",
+        'week': "date({column}, 'weekday 0', '-6 days')",
+        'month': "date({column}, 'start of month')",
+    }
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # Let sessions read while another thread re-ingests a table
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _insert(self, conn, name, data):
+        data = data.assign(**{column: data[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+                              for column in data.columns if pd.api.types.is_datetime64_any_dtype(data[column])})
+        data.to_sql(name, conn, index=False, chunksize=INSERT_CHUNK_ROWS)
+
+class DuckDBEngine(SqlEngine):
+    """SQL engine on a DuckDB file, for columnar scans of long histories"""
+
+    backend = 'duckdb'
+    database_name = 'dashboard.duckdb'
+    PERIODS = {grain: f"CAST(date_trunc('{grain}', {{column}}) AS DATE)" for grain in GRAINS}
+
+    def __init__(self, data_dir=DATA_DIR):
+        # One connection per process; each query runs on its own cursor
+        path = os.path.join(data_dir, SIDECAR_DIR, self.database_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = duckdb.connect(path)
+        super().__init__(data_dir)
+
+    def _connect(self):
+        return self._connection.cursor()
+
+    def _query(self, sql, params=()):
+        with self._connection.cursor() as cursor:
+            return cursor.execute(sql, params).df()
+
+    def _insert(self, conn, name, data):
+        conn.register('incoming', data)
+        conn.execute(f'CREATE TABLE "{name}" AS SELECT * FROM incoming')
+        conn.unregister('incoming')
+
+_ENGINES = {
+    'csv': FrameEngine,
+    'sqlite': SQLiteEngine,
+    'duckdb': DuckDBEngine,
+}
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(backend=None, data_dir=DATA_DIR):
+    """Return the process-wide query engine of a storage backend
+
+    Defaults to DASHBOARD_BACKEND ('csv'). The DuckDB backend falls back to
+    SQLite when the duckdb package is not installed.
+    """
+    backend = (backend or BACKEND).lower()
+    if backend not in _ENGINES:
+        raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == 'duckdb' and duckdb is None:
+        print("duckdb is not installed, using the sqlite backend")
+        backend = 'sqlite'
+    key = (backend, os.path.abspath(data_dir))
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = _ENGINES[backend](data_dir)
+        return _engines[key]
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from utils.data_loader import DATASETS
+
+# Seconds between checks of the data sources for new versions. 0 turns the
+# background refresh off, and every request then checks the sources itself.
+REFRESH_SECONDS = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', '30'))
+
+class RefreshScheduler:
+    """Background thread that swaps new versions of changed datasets into an engine
+
+    Every `interval` seconds each dataset's source is checked, and the
+    engine's refresh() loads a changed one with its rollups and swaps it in
+    at once. While the scheduler runs, requests serve the version the
+    engine has loaded without checking sources, so no session waits on
+    ingestion; sessions see new data on their next rerun after a swap.
+    """
+
+    def __init__(self, engine, names=DATASETS, interval=REFRESH_SECONDS):
+        self.engine = engine
+        self.names = tuple(names)
+        self.interval = interval
+        self.checks = 0
+        self.swaps = 0
+        self.errors = 0
+        self.last_check = None
+        self.last_swap = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self.engine.background_refresh = True
+            self._thread = threading.Thread(target=self._run, name=f"dataset-refresh-{self.engine.backend}",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.engine.background_refresh = False
+
+    def run_once(self):
+        """Check every dataset once and return the names of those swapped in"""
+        swapped = []
+        for name in self.names:
+            try:
+                if self.engine.refresh(name):
+                    swapped.append(name)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error refreshing {name} data: {e}")
+        self.checks += 1
+        self.last_check = time.time()
+        if swapped:
+            self.swaps += len(swapped)
+            self.last_swap = self.last_check
+            print(f"Refreshed {', '.join(swapped)} data")
+        return swapped
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def start_background_refresh(engine, interval=REFRESH_SECONDS):
+    """Start the process-wide refresh scheduler of an engine unless it is running
+
+    Returns the scheduler, or None when the refresh is turned off.
+    """
+    if interval <= 0:
+        return None
+    with _schedulers_lock:
+        scheduler = _schedulers.get(engine)
+        if scheduler is None:
+            scheduler = _schedulers[engine] = RefreshScheduler(engine, interval=interval)
+        return scheduler.start()
@@ -0,0 +1,302 @@
+import threading
+import pandas as pd
+import numpy as np
+from utils.dates import date_bounds
+
+# Time grains, mapped to the pandas period used to bucket dates
+GRAINS = {
+    'day': 'D',
+    'week': 'W',
+    'month': 'M',
+}
+
+# Measures and dimension combinations materialized for each dataset
+ROLLUP_SPECS = {
+    'stope': {
+        'measures': ['stope_width', 'rock_density', 'depth'],
+        'dimensions': [(), ('stope_id',), ('zone',)],
+    },
+    'blast': {
+        'measures': ['explosives_used', 'fragmentation_size', 'vibration_level'],
+        'dimensions': [(), ('blast_id',), ('sequence_number',)],
+    },
+    'equipment': {
+        'measures': ['utilization_rate', 'hours_operated', 'maintenance_hours',
+                     'downtime_hours', 'fuel_consumption'],
+        'dimensions': [(), ('equipment_type',), ('equipment_id',)],
+    },
+}
+
+# Columns every cube is also broken down by when a dataset has them, so the
+# cubes can be restricted to some of their values (see filter_rollups)
+PARTITIONS = ('site',)
+
+STATISTICS = ('count', 'sum', 'sumsq', 'min', 'max')
+ROWS = 'rows'
+
+def _stat_column(measure, stat):
+    return f"{measure}__{stat}"
+
+class RollupCube:
+    """Count/sum/sum-of-squares/min/max of measures by period and dimensions
+
+    `frame` has one row per (period, *dimensions) with a `rows` column and
+    one `<measure>__<stat>` column per measure and statistic. Rows are
+    sorted by period, which is the start timestamp of the time bucket.
+    """
+
+    def __init__(self, frame, grain, dimensions, measures):
+        self.frame = frame
+        self.grain = grain
+        self.dimensions = tuple(dimensions)
+        self.measures = list(measures)
+
+    @property
+    def rows(self):
+        """Number of raw rows summarized by the cube"""
+        return int(self.frame[ROWS].sum())
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    def date_span_days(self):
+        """Days between the first and last period of the cube"""
+        if self.frame.empty:
+            return 0
+        return (self.frame['period'].iloc[-1] - self.frame['period'].iloc[0]).days
+
+    def slice(self, start_date=None, end_date=None):
+        """Return the cube restricted to periods starting within the date range
+
+        Slicing is exact at day grain; at coarser grains a period is kept
+        whole when it starts inside the range.
+        """
+        lo, hi = date_bounds(self.frame['period'].to_numpy(), start_date, end_date)
+        return RollupCube(self.frame.iloc[lo:hi], self.grain, self.dimensions, self.measures)
+
+    def filter(self, column, values):
+        """Return the cube restricted to rows whose `column` is one of `values`"""
+        frame = self.frame[self.frame[column].isin(values)]
+        return RollupCube(frame, self.grain, self.dimensions, self.measures)
+
+    def totals(self, measure):
+        """Return count/sum/sumsq/min/max of a measure over the whole cube"""
+        return {
+            'count': self.frame[_stat_column(measure, 'count')].sum(),
+            'sum': self.frame[_stat_column(measure, 'sum')].sum(),
+            'sumsq': self.frame[_stat_column(measure, 'sumsq')].sum(),
+            'min': self.frame[_stat_column(measure, 'min')].min(),
+            'max': self.frame[_stat_column(measure, 'max')].max(),
+        }
+
+    def summarize(self, measure, by=None):
+        """Return count, sum, mean, std, min and max of a measure grouped by `by`
+
+        `by` is a column name or list drawn from the cube's dimensions and
+        'period'. Standard deviations are sample (ddof=1) deviations.
+        """
+        if by is None:
+            by = []
+        elif isinstance(by, str):
+            by = [by]
+        columns = [_stat_column(measure, stat) for stat in STATISTICS]
+        if by:
+            grouped = _combine(self.frame[list(by) + columns], list(by))
+        else:
+            grouped = pd.DataFrame([self.totals(measure)])
+            grouped.columns = columns
+
+        count = grouped[_stat_column(measure, 'count')]
+        total = grouped[_stat_column(measure, 'sum')]
+        sumsq = grouped[_stat_column(measure, 'sumsq')]
+        summary = grouped[list(by)].copy()
+        summary['count'] = count
+        summary['sum'] = total
+        summary['mean'] = total / count
+        variance = (sumsq - total ** 2 / count) / (count - 1)
+        summary['std'] = np.sqrt(variance.clip(lower=0))
+        summary['min'] = grouped[_stat_column(measure, 'min')]
+        summary['max'] = grouped[_stat_column(measure, 'max')]
+        return summary
+
+    def mean(self, measure, by):
+        """Return the mean of a measure grouped by `by`, named after the measure"""
+        summary = self.summarize(measure, by)
+        return summary.drop(columns=['count', 'sum', 'std', 'min', 'max']).rename(columns={'mean': measure})
+
+def _combine(frame, keys):
+    """Re-aggregate cube rows onto a coarser set of keys"""
+    aggregations = {}
+    for column in frame.columns:
+        if column in keys:
+            continue
+        if column.endswith('__min'):
+            aggregations[column] = 'min'
+        elif column.endswith('__max'):
+            aggregations[column] = 'max'
+        else:
+            aggregations[column] = 'sum'
+    return frame.groupby(keys, observed=True, sort=True).agg(aggregations).reset_index()
+
+def _base_cube(df, dimensions, measures):
+    """Aggregate raw rows by day and every dimension of the dataset"""
+    work = pd.DataFrame({'period': df['date'].dt.floor('D')})
+    for dimension in dimensions:
+        work[dimension] = df[dimension]
+    keys = ['period'] + list(dimensions)
+
+    work[ROWS] = 1
+    for measure in measures:
+        values = df[measure].astype('float64')
+        work[_stat_column(measure, 'count')] = values.notna().astype('int64')
+        work[_stat_column(measure, 'sum')] = values.fillna(0)
+        work[_stat_column(measure, 'sumsq')] = (values ** 2).fillna(0)
+        work[_stat_column(measure, 'min')] = values
+        work[_stat_column(measure, 'max')] = values
+    return _combine(work, keys)
+
+def _regrain(frame, grain):
+    """Move a day-level cube frame to the start of each period of `grain`"""
+    if grain == 'day':
+        return frame
+    frame = frame.copy()
+    frame['period'] = frame['period'].dt.to_period(GRAINS[grain]).dt.start_time
+    return frame
+
+def build_rollups(name, df):
+    """Materialize every (grain, dimensions) cube declared for a dataset
+
+    Raw rows are scanned once into a day-level cube over all of the
+    dataset's dimensions; every other cube is rolled up from that one.
+    Returns a dict keyed by (grain, dimensions). Cubes of data with a
+    PARTITIONS column such as `site` are also broken down by it.
+    """
+    spec = ROLLUP_SPECS[name]
+    partitions = [p for p in PARTITIONS if p in df.columns]
+    dimensions = partitions + [d for d in dict.fromkeys(sum(spec['dimensions'], ())) if d in df.columns]
+    measures = [m for m in spec['measures'] if m in df.columns]
+    base = _base_cube(df, dimensions, measures)
+
+    cubes = {}
+    for grain in GRAINS:
+        grained = _regrain(base, grain)
+        for dims in spec['dimensions']:
+            if not all(d in dimensions for d in dims):
+                continue
+            keys = ['period'] + partitions + list(dims)
+            columns = keys + [c for c in base.columns if c not in ['period'] + dimensions]
+            frame = _combine(grained[columns], keys)
+            cubes[(grain, dims)] = RollupCube(frame, grain, partitions + list(dims), measures)
+    return cubes
+
+def merge_periods(frame, new_frame, keys, combine):
+    """Fold the aggregates of appended rows into a period-sorted aggregate frame
+
+    Only the rows from the first period of `new_frame` on are combined
+    again, with `combine(frame, keys)`; earlier rows are kept as they are.
+    """
+    split = frame['period'].searchsorted(new_frame['period'].iloc[0], side='left')
+    touched = combine(pd.concat([frame.iloc[split:], new_frame], ignore_index=True), keys)
+    return pd.concat([frame.iloc[:split], touched], ignore_index=True)
+
+def extend_rollups(name, cubes, new_rows):
+    """Merge rollups of newly appended rows into an existing rollup set
+
+    Counts and sums add up and minima/maxima combine, so only the cube
+    rows from the first period touched by the new data are re-aggregated.
+    """
+    if new_rows.empty:
+        return cubes
+    new_cubes = build_rollups(name, new_rows)
+    extended = {}
+    for key, cube in cubes.items():
+        if key not in new_cubes:
+            extended[key] = cube
+            continue
+        frame = merge_periods(cube.frame, new_cubes[key].frame, ['period'] + list(cube.dimensions), _combine)
+        extended[key] = RollupCube(frame, cube.grain, cube.dimensions, cube.measures)
+    return extended
+
+def slice_rollups(cubes, start_date=None, end_date=None):
+    """Restrict every cube of a rollup set to a date range"""
+    if start_date is None and end_date is None:
+        return cubes
+    return {key: cube.slice(start_date, end_date) for key, cube in cubes.items()}
+
+def filter_rollups(cubes, column, values=None):
+    """Restrict every cube of a rollup set to some values of a partition column
+
+    None keeps every value; cubes without the column are returned as they are.
+    """
+    if values is None:
+        return cubes
+    return {key: cube.filter(column, values) if column in cube.dimensions else cube
+            for key, cube in cubes.items()}
+
+def pick_grain(start_date, end_date, max_periods=730):
+    """Return the finest grain that keeps a date range within max_periods buckets"""
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    if days <= max_periods:
+        return 'day'
+    if days <= max_periods * 7:
+        return 'week'
+    return 'month'
+
+class VersionedCache:
+    """Aggregates of loaded datasets, shared across sessions and built once per data version
+
+    The newest `versions` versions of each key are kept, so sessions still
+    reading the previous version are served from the cache while the next
+    one is built.
+    """
+
+    def __init__(self, versions):
+        self.versions = versions
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, df, build, extend):
+        """Return the aggregates of a loaded frame under `key`
+
+        The version is taken from `df.attrs['version']`, which load_dataset
+        sets; frames without one are built on every call. `build(df)`
+        aggregates a whole frame. When the frame is a cached version plus
+        appended rows, `extend(base, new_rows)` folds just those rows into
+        the cached aggregates, or returns None to have them rebuilt.
+        """
+        version = df.attrs.get('version')
+        if version is None:
+            return build(df)
+
+        aggregates = self._entries.get(key, {}).get(version)
+        if aggregates is not None:
+            return aggregates
+        with self._lock:
+            versions = self._entries.setdefault(key, {})
+            if version in versions:
+                return versions[version]
+            appended = df.attrs.get('appended')
+            base = versions.get(appended['base_version']) if appended else None
+            if base is not None:
+                aggregates = extend(base, df.iloc[appended['base_rows']:])
+            if aggregates is None:
+                aggregates = build(df)
+            versions[version] = aggregates
+            while len(versions) > self.versions:
+                del versions[next(iter(versions))]
+            return aggregates
+
+# Rollups are rebuilt only when the dataset version changes
+ROLLUP_VERSIONS = 2
+_rollup_cache = VersionedCache(ROLLUP_VERSIONS)
+
+def get_rollups(name, df):
+    """Return the rollups of a loaded dataset, building them once per data version
+
+    The version is taken from `df.attrs['version']`, which load_dataset
+    sets; frames without one are aggregated on every call. When the frame
+    is a cached version plus appended rows, only those rows are folded in.
+    """
+    return _rollup_cache.get(name, df, lambda data: build_rollups(name, data),
+                             lambda cubes, new_rows: extend_rollups(name, cubes, new_rows))
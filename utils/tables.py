@@ -0,0 +1,87 @@
+import io
+import os
+import numpy as np
+from utils.sized_cache import SizedCache
+
+try:
+    import pyarrow.parquet as parquet
+except ImportError:
+    parquet = None
+
+PAGE_SIZES = [25, 50, 100, 500]
+EXPORT_FORMATS = ['CSV', 'Parquet'] if parquet is not None else ['CSV']
+
+# Upper bound on the sort orders and exports kept in memory, shared by all
+# sessions, so a session holds only the keys of its table state
+TABLE_CACHE_MB = int(os.environ.get('DASHBOARD_TABLE_CACHE_MB', '256'))
+_table_cache = SizedCache(TABLE_CACHE_MB * 1024 * 1024)
+
+def apply_table_filters(df, filters):
+    """Return the rows of df matching every column filter
+
+    `filters` maps a column to ('in', values) for categorical columns or
+    ('between', low, high) for numeric ones, inclusive of both ends.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, condition in filters.items():
+        if condition[0] == 'in':
+            mask &= df[column].isin(condition[1]).to_numpy()
+        elif condition[0] == 'between':
+            values = df[column].to_numpy()
+            mask &= (values >= condition[1]) & (values <= condition[2])
+        else:
+            raise ValueError(f"Unknown table filter {condition[0]!r} on column {column!r}")
+    if mask.all():
+        return df
+    return df[mask]
+
+def sort_order(df, column, ascending=True):
+    """Return the row positions of df ordered by a column, missing values last
+
+    The sort is stable, so rows with equal values keep their order and
+    pages cut from the same order never overlap.
+    """
+    values = df[column].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+def cached_sort_order(key, df, column, ascending=True):
+    """Return sort_order(df, column, ascending), sorting only on a miss
+
+    `key` identifies the rows of df and the sort (data version, filters,
+    column and direction); with a key of None the rows are sorted on
+    every call.
+    """
+    if key is None:
+        return sort_order(df, column, ascending)
+    order = _table_cache.get(('order', key))
+    if order is None:
+        order = sort_order(df, column, ascending)
+        _table_cache.put(('order', key), order, order.nbytes)
+    return order
+
+def table_page(df, order, page, page_size):
+    """Return page `page` (from 0) of df in the given row order"""
+    start = page * page_size
+    positions = np.arange(len(df)) if order is None else order
+    return df.iloc[positions[start:start + page_size]]
+
+def cached_export(key):
+    """Return the export stored under `key`, or None when it was never made or was evicted"""
+    return _table_cache.get(('export', key))
+
+def store_export(key, data):
+    _table_cache.put(('export', key), data, len(data))
+
+def table_cache_stats():
+    """Return the hit/miss/eviction counters and size of the table cache"""
+    return _table_cache.stats()
+
+def export_table(df, fmt):
+    """Encode a frame as CSV or Parquet bytes for download"""
+    if fmt == 'CSV':
+        return df.to_csv(index=False).encode()
+    if fmt == 'Parquet' and parquet is not None:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported export format {fmt!r}")